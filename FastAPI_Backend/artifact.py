@@ -0,0 +1,220 @@
+"""Versioned on-disk form of a fitted ``RecommenderEngine``.
+
+An artifact is a directory holding ``manifest.json`` and one ``.npy`` file per
+array: the scaled and the L2-normalised nutrition matrices, the scaler
+parameters, the ingredient index, the packed recipe columns, the ``ivf``
+backend's clusters (centroids and rows in cluster order) and any prebuilt
+filter partitions (rows and normalised vectors). Everything is
+loaded with ``np.load(mmap_mode='r')``, so every uvicorn worker maps the same
+files and shares them through the OS page cache instead of holding a copy.
+
+Build one offline with::
+
+    python artifact.py ../Data/dataset.csv ../Data/engine_artifact [--no-partitions] [--ivf-lists N]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from columns import StringColumn,StringListColumn
+from ingredient_index import IngredientIndex
+from model import NUTRITION_COLUMNS,IVFBackend,RecommenderEngine,unit_rows
+
+FORMAT_VERSION=1
+MANIFEST='manifest.json'
+IVF_ARRAYS=('centroids','rows','offsets','unit')
+
+
+def _save(path,name,array):
+    # Replace rather than overwrite, so workers still mapping the old file are unaffected
+    target=os.path.join(path,name+'.npy')
+    with open(target+'.tmp','wb') as f:
+        np.save(f,np.ascontiguousarray(array))
+    os.replace(target+'.tmp',target)
+
+def _load(path,name):
+    return np.load(os.path.join(path,name+'.npy'),mmap_mode='r')
+
+def _save_strings(path,name,column):
+    _save(path,name+'.data',column.data)
+    _save(path,name+'.offsets',column.offsets)
+    nulls_path=os.path.join(path,name+'.nulls.npy')
+    if column.nulls is not None:
+        _save(path,name+'.nulls',column.nulls)
+    elif os.path.exists(nulls_path):
+        os.remove(nulls_path)
+
+def _load_strings(path,name):
+    nulls=name+'.nulls'
+    return StringColumn(_load(path,name+'.data'),_load(path,name+'.offsets'),
+                        _load(path,nulls) if os.path.exists(os.path.join(path,nulls+'.npy')) else None)
+
+
+def save_artifact(engine,path,ivf_lists=None):
+    """Write ``engine`` to ``path``; the IVF clusters are the engine's own or built with ``ivf_lists`` lists."""
+    os.makedirs(path,exist_ok=True)
+    if is_artifact(path):
+        os.remove(os.path.join(path,MANIFEST))
+    scaler=engine.scaler
+    _save(path,'scaler.mean',scaler.mean_)
+    _save(path,'scaler.scale',scaler.scale_)
+    _save(path,'scaler.var',scaler.var_)
+    _save(path,'prep_data',engine.prep_data)
+    unit=unit_rows(engine.prep_data)
+    _save(path,'unit',unit)
+
+    index=engine.ingredient_index
+    _save_strings(path,'ingredients.vocabulary',StringColumn.from_values(index.vocabulary))
+    posting_offsets=np.zeros(len(index.postings)+1,dtype=np.int64)
+    np.cumsum([p.shape[0] for p in index.postings],out=posting_offsets[1:])
+    _save(path,'ingredients.postings',np.concatenate(index.postings) if index.postings else np.empty(0,np.int32))
+    _save(path,'ingredients.posting_offsets',posting_offsets)
+    _save(path,'ingredients.row_segments',index.row_segments)
+    _save(path,'ingredients.row_offsets',index.row_offsets)
+
+    columns=[]
+    for name,column in engine.columns.items():
+        key='column.'+name
+        if isinstance(column,StringListColumn):
+            kind='string_list'
+            _save_strings(path,key,column.strings)
+            _save(path,key+'.rows',column.row_offsets)
+        elif isinstance(column,StringColumn):
+            kind='string'
+            _save_strings(path,key,column)
+        else:
+            kind='numeric'
+            _save(path,key,column)
+        columns.append({'name':name,'kind':kind})
+
+    # Partitions back to back: their rows, and those rows' normalised vectors
+    partitions=list(engine.partitions.items())
+    if partitions:
+        offsets=np.zeros(len(partitions)+1,dtype=np.int64)
+        np.cumsum([len(part) for _,part in partitions],out=offsets[1:])
+        rows=np.concatenate([np.asarray(part.rows,dtype=np.int64) for _,part in partitions])
+        _save(path,'partitions.rows',rows)
+        _save(path,'partitions.offsets',offsets)
+        _save(path,'partitions.unit',unit[rows])
+
+    if isinstance(engine.backend,IVFBackend) and ivf_lists in (None,engine.backend.n_lists):
+        backend=engine.backend
+        lists=backend.centroids,backend.list_rows,backend.list_offsets,backend.list_unit
+    else:
+        lists=IVFBackend.build_lists(unit,ivf_lists)
+    for name,array in zip(IVF_ARRAYS,lists):
+        _save(path,'ivf.'+name,array)
+
+    manifest={
+        'format_version':FORMAT_VERSION,
+        'n_recipes':engine.n_recipes,
+        'nutrition_columns':NUTRITION_COLUMNS,
+        'columns':columns,
+        'partitions':[list(key) for key,_ in partitions],
+        'ivf_lists':int(lists[0].shape[0]),
+    }
+    # Written last so a partially built directory is never mistaken for an artifact
+    with open(os.path.join(path,MANIFEST),'w') as f:
+        json.dump(manifest,f,indent=2)
+
+
+def load_artifact(path,backend='sklearn',backend_options=None):
+    with open(os.path.join(path,MANIFEST)) as f:
+        manifest=json.load(f)
+    if manifest.get('format_version')!=FORMAT_VERSION:
+        raise ValueError(f"Artifact {path} has format version {manifest.get('format_version')}, "
+                         f"expected {FORMAT_VERSION}; rebuild it with artifact.py")
+    if manifest['nutrition_columns']!=NUTRITION_COLUMNS:
+        raise ValueError(f'Artifact {path} was built for different nutrition columns')
+
+    scaler=StandardScaler()
+    scaler.mean_=np.array(_load(path,'scaler.mean'))
+    scaler.scale_=np.array(_load(path,'scaler.scale'))
+    scaler.var_=np.array(_load(path,'scaler.var'))
+    scaler.n_features_in_=len(NUTRITION_COLUMNS)
+    scaler.n_samples_seen_=manifest['n_recipes']
+
+    vocabulary=_load_strings(path,'ingredients.vocabulary')
+    postings=_load(path,'ingredients.postings')
+    posting_offsets=_load(path,'ingredients.posting_offsets')
+    ingredient_index=IngredientIndex(
+        vocabulary.take(range(len(vocabulary))),
+        [postings[posting_offsets[i]:posting_offsets[i+1]] for i in range(len(vocabulary))],
+        _load(path,'ingredients.row_segments'),
+        _load(path,'ingredients.row_offsets'))
+
+    columns={}
+    for column in manifest['columns']:
+        name,kind=column['name'],column['kind']
+        key='column.'+name
+        if kind=='string_list':
+            columns[name]=StringListColumn(_load_strings(path,key),_load(path,key+'.rows'))
+        elif kind=='string':
+            columns[name]=_load_strings(path,key)
+        else:
+            columns[name]=_load(path,key)
+
+    # Saved clusters unless a different list count is asked for (old artifacts have none)
+    if backend=='ivf' and manifest.get('ivf_lists') and (backend_options or {}).get('n_lists') in (None,manifest['ivf_lists']):
+        backend_options={**(backend_options or {}),'lists':tuple(_load(path,'ivf.'+name) for name in IVF_ARRAYS)}
+    engine=RecommenderEngine(scaler,_load(path,'prep_data'),ingredient_index,columns,
+                             backend=backend,unit=_load(path,'unit'),backend_options=backend_options)
+    if manifest.get('partitions'):
+        rows,offsets,unit=_load(path,'partitions.rows'),_load(path,'partitions.offsets'),_load(path,'partitions.unit')
+        engine.partitions={tuple(key):engine._partition(rows[offsets[i]:offsets[i+1]],unit[offsets[i]:offsets[i+1]])
+                           for i,key in enumerate(manifest['partitions'])}
+    return engine
+
+
+def add_string_column(path,name,column):
+    """Attach an extra string column (e.g. image links) to an existing artifact."""
+    with open(os.path.join(path,MANIFEST)) as f:
+        manifest=json.load(f)
+    if len(column)!=manifest['n_recipes']:
+        raise ValueError(f"Column {name} has {len(column)} rows, artifact has {manifest['n_recipes']}")
+    _save_strings(path,'column.'+name,column)
+    manifest['columns']=[c for c in manifest['columns'] if c['name']!=name]+[{'name':name,'kind':'string'}]
+    tmp_path=os.path.join(path,MANIFEST+'.tmp')
+    with open(tmp_path,'w') as f:
+        json.dump(manifest,f,indent=2)
+    os.replace(tmp_path,os.path.join(path,MANIFEST))
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path,MANIFEST))
+
+
+def open_engine(artifact_path,dataset_path,backend='sklearn',backend_options=None,partitions=None):
+    """The artifact at ``artifact_path`` if there is one, else an engine fitted on the dataset.
+
+    ``partitions`` are ``build_partitions`` arguments, or None for no
+    partitions. Partitions saved in the artifact are used as they are.
+    """
+    if is_artifact(artifact_path):
+        engine=load_artifact(artifact_path,backend=backend,backend_options=backend_options)
+    else:
+        from data_loader import load_recipes
+        engine=RecommenderEngine.from_dataframe(load_recipes(dataset_path),backend=backend,backend_options=backend_options)
+    if partitions is None:
+        engine.partitions={}
+    elif not engine.partitions:
+        engine.build_partitions(**partitions)
+    return engine
+
+
+if __name__=='__main__':
+    from data_loader import load_recipes
+    parser=argparse.ArgumentParser(description='Build an engine artifact from the recipe dataset')
+    parser.add_argument('dataset')
+    parser.add_argument('artifact')
+    parser.add_argument('--no-partitions',action='store_true')
+    parser.add_argument('--ivf-lists',type=int,default=None,help='clusters of the ivf backend (default sqrt(n))')
+    args=parser.parse_args()
+    engine=RecommenderEngine.from_dataframe(load_recipes(args.dataset))
+    if not args.no_partitions:
+        engine.build_partitions()
+    save_artifact(engine,args.artifact,args.ivf_lists)
+    print(f'Wrote artifact to {args.artifact}')
@@ -0,0 +1,86 @@
+import asyncio
+
+
+class MicroBatcher:
+    """Coalesces concurrent single queries into one ``recommend_batch`` call.
+
+    Queries wait at most ``window`` seconds (or until ``max_batch`` have
+    arrived) and are then searched together: the engine scales them in one
+    pass and ranks each candidate set with one matrix-matrix search. Every
+    caller gets its own result back. Queries with different ``n_neighbors``
+    go out as separate batches. ``run`` is the coroutine that executes an
+    engine method, e.g. ``SearchExecutor.run``. An error of the whole call
+    reaches every caller of the batch; a query whose own filter fails (see
+    ``recommend_batch``) fails alone.
+    """
+
+    def __init__(self, run, window=0.002, max_batch=64):
+        self.run = run
+        self.window = window
+        self.max_batch = max_batch
+        self._waiting = []
+        self._timer = None
+        # Running dispatches; the event loop only keeps weak references to tasks
+        self._tasks = set()
+        self.batches = 0
+        self.queries = 0
+
+    async def recommend(self, engine, nutrition_input, ingredients, params, category=None, healthy=False):
+        if self.window <= 0 or self.max_batch <= 1:
+            return await self.run(engine, "recommend", nutrition_input, ingredients, params, category, healthy)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((engine, nutrition_input, ingredients, category, healthy, params["n_neighbors"], future))
+        if len(self._waiting) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        waiting, self._waiting = self._waiting, []
+        groups = {}
+        for item in waiting:
+            groups.setdefault(item[5], []).append(item)
+        for n_neighbors, items in groups.items():
+            task = asyncio.ensure_future(self._dispatch(n_neighbors, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, n_neighbors, items):
+        self.batches += 1
+        self.queries += len(items)
+        try:
+            results = await self.run(
+                items[0][0],
+                "recommend_batch",
+                [item[1] for item in items],
+                [item[2] for item in items],
+                {"n_neighbors": n_neighbors, "return_distance": False},
+                [item[3] for item in items],
+                [item[4] for item in items],
+            )
+        except Exception as e:
+            for item in items:
+                if not item[6].done():
+                    item[6].set_exception(e)
+            return
+        for item, result in zip(items, results):
+            if item[6].done():
+                continue
+            if isinstance(result, Exception):
+                item[6].set_exception(result)
+            else:
+                item[6].set_result(result)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,81 @@
+"""Recall@k and latency of the search backends against the legacy ``model.recommend``.
+
+Ground truth is the original per-request pipeline (scaler and brute-force
+cosine ``NearestNeighbors`` refitted on the whole dataset) on a fixed, seeded
+query set: the nutrition vectors of randomly drawn recipes with up to 20%
+noise. The legacy filter drops recipes without ``RecipeIngredientParts`` (and
+refits its scaler on the rest) even for ingredient-free queries, so those
+recipes are removed for both sides and recall measures only the search
+itself. Each backend then answers the same queries one at a time through
+``RecommenderEngine.kneighbors``; the ``ivf`` backend is measured once per
+``--probes`` value.
+
+    python benchmark_ann.py ../Data/dataset.csv --queries 200 --k 10 --probes 1 2 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from data_loader import ENGINE_COLUMNS
+from model import NUTRITION_COLUMNS,RecommenderEngine,read_dataset,recommend
+
+
+def query_set(dataframe,n_queries,seed=0):
+    rng=np.random.default_rng(seed)
+    rows=rng.choice(dataframe.shape[0],n_queries,replace=False)
+    values=dataframe[NUTRITION_COLUMNS].to_numpy(dtype=float)[rows]
+    return values*rng.uniform(0.8,1.2,size=values.shape)
+
+
+def legacy_neighbors(dataframe,queries,k):
+    params={'n_neighbors':k,'return_distance':False}
+    return [recommend(dataframe,query,[],params).index.to_numpy() for query in queries]
+
+
+def measure(engine,queries,k,truth):
+    latencies=[]
+    hits=0
+    for query,expected in zip(queries,truth):
+        start=time.perf_counter()
+        found=engine.kneighbors(query,k)
+        latencies.append(time.perf_counter()-start)
+        hits+=np.intersect1d(found,expected).shape[0]
+    latencies=np.array(latencies)*1000
+    return hits/(k*len(truth)),latencies.mean(),np.percentile(latencies,99)
+
+
+def main(dataset_path,n_queries,k,probes,n_lists=None):
+    dataframe=read_dataset(dataset_path)
+    dataframe=dataframe.dropna(subset=['RecipeIngredientParts']).reset_index(drop=True)
+    queries=query_set(dataframe,n_queries)
+    start=time.perf_counter()
+    truth=legacy_neighbors(dataframe,queries,k)
+    print(f'{dataframe.shape[0]} recipes, {n_queries} queries, legacy recommend: '
+          f'{(time.perf_counter()-start)*1000/n_queries:.1f} ms/query')
+    engine_data=dataframe[[name for name in ENGINE_COLUMNS if name in dataframe]]
+
+    print(f"{'backend':<16}{'recall@'+str(k):>10}{'mean ms':>10}{'p99 ms':>10}")
+    for backend in ['sklearn','matmul']:
+        engine=RecommenderEngine.from_dataframe(engine_data,backend=backend)
+        recall,mean,p99=measure(engine,queries,k,truth)
+        print(f'{backend:<16}{recall:>10.3f}{mean:>10.2f}{p99:>10.2f}')
+
+    start=time.perf_counter()
+    engine=RecommenderEngine.from_dataframe(engine_data,backend='ivf',backend_options={'n_lists':n_lists})
+    print(f'ivf: {engine.backend.n_lists} lists built in {time.perf_counter()-start:.1f} s')
+    for n_probe in probes:
+        engine.backend.n_probe=n_probe
+        recall,mean,p99=measure(engine,queries,k,truth)
+        print(f"{'ivf n_probe='+str(n_probe):<16}{recall:>10.3f}{mean:>10.2f}{p99:>10.2f}")
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Recall@k and latency of the search backends')
+    parser.add_argument('dataset')
+    parser.add_argument('--queries',type=int,default=200)
+    parser.add_argument('--k',type=int,default=10)
+    parser.add_argument('--probes',type=int,nargs='+',default=[1,2,4,8,16,32])
+    parser.add_argument('--lists',type=int,default=None)
+    args=parser.parse_args()
+    main(args.dataset,args.queries,args.k,args.probes,args.lists)
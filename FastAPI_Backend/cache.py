@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+from ingredient_index import is_plain_term
+
+# Nutrition values are rounded to this many decimals before keying
+KEY_DECIMALS = 2
+
+
+def request_key(nutrition_input, ingredients, n_neighbors, category=None, healthy=False):
+    """Cache key for a recommendation query.
+
+    Plain ingredient terms match case-insensitively, so they are lowercased;
+    terms with regex syntax are kept verbatim. Order and duplicates never
+    change the result, so the set is sorted.
+    """
+    nutrition = tuple(round(float(value), KEY_DECIMALS) for value in nutrition_input)
+    terms = tuple(sorted({term.lower() if is_plain_term(term) else term for term in ingredients}))
+    return nutrition, terms, n_neighbors, category, bool(healthy)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a time-to-live and hit/miss counters."""
+
+    def __init__(self, max_size=4096, ttl=600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,81 @@
+import re
+
+import numpy as np
+
+_QUOTED=re.compile(r'"([^"]*)"')
+
+
+def parse_r_list(s):
+    """Strings inside the double quotes of an R-style ``c("a", "b")`` value."""
+    if not isinstance(s,str):
+        return []
+    return _QUOTED.findall(s)
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer, sliced by an offsets array.
+
+    ``offsets`` has one more entry than there are strings; string ``i`` is
+    ``data[offsets[i]:offsets[i+1]]``. Missing values are flagged in ``nulls``.
+    """
+    def __init__(self,data,offsets,nulls=None):
+        self.data=data
+        self.offsets=offsets
+        self.nulls=nulls
+
+    @classmethod
+    def from_values(cls,values):
+        encoded=[]
+        nulls=np.zeros(len(values),dtype=bool)
+        for i,value in enumerate(values):
+            if isinstance(value,str):
+                encoded.append(value.encode('utf-8'))
+            else:
+                nulls[i]=True
+                encoded.append(b'')
+        offsets=np.zeros(len(encoded)+1,dtype=np.int64)
+        np.cumsum([len(b) for b in encoded],out=offsets[1:])
+        data=np.frombuffer(b''.join(encoded),dtype=np.uint8)
+        return cls(data,offsets,nulls if nulls.any() else None)
+
+    def __len__(self):
+        return self.offsets.shape[0]-1
+
+    def __getitem__(self,i):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i+1]].tobytes().decode('utf-8')
+
+    def take(self,indices):
+        return [self[i] for i in indices]
+
+
+class StringListColumn:
+    """Per-row lists of strings: a flat ``StringColumn`` plus row offsets.
+
+    Row ``i`` holds strings ``row_offsets[i]`` to ``row_offsets[i+1]`` of ``strings``.
+    """
+    def __init__(self,strings,row_offsets):
+        self.strings=strings
+        self.row_offsets=row_offsets
+
+    @classmethod
+    def from_lists(cls,lists):
+        row_offsets=np.zeros(len(lists)+1,dtype=np.int64)
+        np.cumsum([len(items) for items in lists],out=row_offsets[1:])
+        flat=[item for items in lists for item in items]
+        return cls(StringColumn.from_values(flat),row_offsets)
+
+    @classmethod
+    def from_r_strings(cls,values):
+        return cls.from_lists([parse_r_list(s) for s in values])
+
+    def __len__(self):
+        return self.row_offsets.shape[0]-1
+
+    def __getitem__(self,i):
+        strings=self.strings
+        return [strings[j] for j in range(self.row_offsets[i],self.row_offsets[i+1])]
+
+    def take(self,indices):
+        return [self[i] for i in indices]
@@ -0,0 +1,60 @@
+"""Recipe dataset loading with a Parquet cache and column projection.
+
+The first load parses the CSV once and writes ``<name>.parquet`` next to it;
+later loads read only the columns the engine serves from that file, skipping
+large text such as ``Description``. Without ``pyarrow``, or when the cache
+cannot be written or converted, the CSV is read with ``usecols`` instead.
+"""
+import os
+
+import pandas as pd
+
+from model import NUTRITION_COLUMNS,read_dataset
+
+ENGINE_COLUMNS=['RecipeId','Name','CookTime','PrepTime','TotalTime','RecipeIngredientParts',
+                *NUTRITION_COLUMNS,'RecipeInstructions','RecipeCategory','AggregatedRating']
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq=None
+
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0]+'.parquet'
+
+
+def convert_to_parquet(csv_path,path=None):
+    """Write the full CSV as Parquet, atomically so concurrent workers never read a partial file."""
+    path=path or parquet_path(csv_path)
+    tmp_path=f'{path}.{os.getpid()}.tmp'
+    try:
+        read_dataset(csv_path).to_parquet(tmp_path,index=False)
+        os.replace(tmp_path,path)
+    finally:
+        # Left behind only when writing or renaming failed
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def load_recipes(csv_path,columns=ENGINE_COLUMNS):
+    """The dataset projected to ``columns`` (those missing from the file are skipped)."""
+    path=parquet_path(csv_path)
+    cached=pq is not None and os.path.exists(path) and os.path.getmtime(path)>=os.path.getmtime(csv_path)
+    if pq is not None and not cached:
+        try:
+            convert_to_parquet(csv_path,path)
+            cached=True
+        except (OSError,ValueError):
+            # e.g. pyarrow's ArrowInvalid/ArrowTypeError on mixed-type object columns
+            pass
+    if not cached:
+        return read_dataset(csv_path,usecols=lambda name:name in columns)
+    available=set(pq.read_schema(path).names)
+    return pd.read_parquet(path,columns=[name for name in columns if name in available])
+
+
+if __name__=='__main__':
+    import sys
+    print(f'Wrote {convert_to_parquet(sys.argv[1])}')
@@ -0,0 +1,130 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from artifact import open_engine
+
+# Engine of a process-pool worker, opened once by the pool initializer
+_worker_engine = None
+
+
+def _init_worker(artifact_path, dataset_path, backend, backend_options, partitions, ready):
+    global _worker_engine
+    try:
+        _worker_engine = open_engine(artifact_path, dataset_path, backend, backend_options, partitions)
+    except Exception as e:
+        ready.put(f"{type(e).__name__}: {e}")
+        raise
+    ready.put(None)
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+def _call_worker(method, args):
+    return getattr(_worker_engine, method)(*args)
+
+
+class Saturated(Exception):
+    """Raised when the search queue is full; the request should be retried later."""
+
+
+class SearchExecutor:
+    """Runs engine calls off the event loop, with a bound on queued work.
+
+    ``kind="thread"`` runs them in a thread pool against the server's engine,
+    which suits the NumPy/BLAS search paths that release the GIL.
+    ``kind="process"`` runs them in worker processes that each open their own
+    engine (from an artifact this is a memory map, so the pages are shared).
+    At most ``max_pending`` calls may be running or queued; further calls
+    raise ``Saturated`` immediately instead of waiting behind them.
+    Call ``start`` before serving so process workers do not open their
+    engines on the first request.
+    """
+
+    def __init__(self, kind="thread", workers=None, max_pending=None,
+                 artifact_path=None, dataset_path=None, backend="sklearn", backend_options=None,
+                 partitions=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind {kind!r}; use 'thread' or 'process'")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        if kind == "process":
+            # Not fork: start() runs while the event loop and loader threads are live
+            context = multiprocessing.get_context("spawn")
+            # Each worker reports here once its engine is open (None) or failed to open
+            self._ready = context.Queue()
+            self._pool = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(artifact_path, dataset_path, backend, backend_options, partitions, self._ready),
+            )
+        else:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="search")
+        # Only touched from the event loop thread
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self, timeout=None):
+        """Start every process worker and block until each has opened its engine.
+
+        Does nothing for thread pools. Raises ``RuntimeError`` if a worker
+        could not open its engine, died before reporting (the pool is then
+        broken), or the workers were not all ready within ``timeout`` seconds.
+        """
+        if self.kind != "process":
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Pools start workers on submit; one call per worker starts all of them
+        futures = [self._pool.submit(_worker_pid) for _ in range(self.workers)]
+        ready = 0
+        while ready < self.workers:
+            try:
+                error = self._ready.get(timeout=1)
+            except queue.Empty:
+                failed = next((f for f in futures if f.done() and not f.cancelled() and f.exception()), None)
+                if failed is not None:
+                    raise RuntimeError(f"Search worker exited before opening its engine: {failed.exception()!r}")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise RuntimeError(f"Search workers did not open their engines within {timeout} s")
+                continue
+            if error is not None:
+                raise RuntimeError(f"Search worker could not open its engine: {error}")
+            ready += 1
+        for future in futures:
+            future.result()
+
+    async def run(self, engine, method, *args):
+        """``engine.<method>(*args)`` on the pool (process workers use their own engine)."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Saturated(f"{self.pending} searches already pending")
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            if self.kind == "process":
+                return await loop.run_in_executor(self._pool, _call_worker, method, args)
+            return await loop.run_in_executor(self._pool, getattr(engine, method), *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,84 @@
+"""Compact recipe subset bundled with the Streamlit frontend for standalone mode.
+
+When the API is unreachable the frontend scores recipes itself from
+``Streamlit_Frontend/fallback_recipes.npz``. This script cuts that file from
+the real dataset: the ``--size`` best rated recipes with complete nutrition
+and at least one ingredient, stored as plain arrays (nutrition matrix, times
+in minutes, and text packed as UTF-8 buffers with offsets) so it loads with
+``np.load(allow_pickle=False)`` and without pandas.
+
+    python fallback_db.py ../Data/dataset.csv ../Streamlit_Frontend/fallback_recipes.npz --size 2000
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from columns import StringColumn,StringListColumn
+from data_loader import load_recipes
+from image_manifest import dataset_image
+from model import NUTRITION_COLUMNS
+
+TIME_COLUMNS=['PrepTime','CookTime','TotalTime']
+_DURATION=re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?')
+
+
+def minutes(value):
+    """Minutes in a numeric value or an ISO 8601 duration such as ``PT1H30M`` (0 when unknown)."""
+    if isinstance(value,str):
+        match=_DURATION.fullmatch(value.strip())
+        if match is None:
+            return 0.0
+        return float(int(match.group(1) or 0)*60+int(match.group(2) or 0))
+    return 0.0 if value is None or pd.isna(value) else float(value)
+
+
+def select_recipes(recipes,size):
+    recipes=recipes.dropna(subset=NUTRITION_COLUMNS)
+    ingredients=StringListColumn.from_r_strings(recipes['RecipeIngredientParts'].tolist())
+    recipes=recipes[np.diff(ingredients.row_offsets)>0]
+    if 'AggregatedRating' in recipes:
+        recipes=recipes.sort_values('AggregatedRating',ascending=False,na_position='last',kind='stable')
+    return recipes.head(size)
+
+
+def _pack(arrays,key,column):
+    strings=column.strings if isinstance(column,StringListColumn) else column
+    arrays[key+'.data']=strings.data
+    arrays[key+'.offsets']=strings.offsets
+    if strings.nulls is not None:
+        arrays[key+'.nulls']=strings.nulls
+    if isinstance(column,StringListColumn):
+        arrays[key+'.rows']=column.row_offsets
+
+
+def build_fallback_db(dataset_path,out_path,size=2000):
+    columns=['Name',*TIME_COLUMNS,'RecipeIngredientParts',*NUTRITION_COLUMNS,'RecipeInstructions','AggregatedRating','Images']
+    recipes=select_recipes(load_recipes(dataset_path,columns=columns),size)
+    arrays={
+        'nutrition_columns':np.array(NUTRITION_COLUMNS),
+        'nutrition':recipes[NUTRITION_COLUMNS].to_numpy(dtype=np.float32),
+    }
+    for name in TIME_COLUMNS:
+        values=recipes[name].tolist() if name in recipes else [0]*len(recipes)
+        arrays[name]=np.array([minutes(v) for v in values],dtype=np.float32)
+    _pack(arrays,'Name',StringColumn.from_values(recipes['Name'].tolist()))
+    for name in ['RecipeIngredientParts','RecipeInstructions']:
+        _pack(arrays,name,StringListColumn.from_r_strings(recipes[name].tolist()))
+    if 'Images' in recipes:
+        _pack(arrays,'image_link',StringColumn.from_values([dataset_image(v) for v in recipes['Images'].tolist()]))
+    tmp_path=out_path+'.tmp.npz'
+    np.savez_compressed(tmp_path,**arrays)
+    os.replace(tmp_path,out_path)
+    return len(recipes)
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Build the Streamlit standalone-mode recipe bundle')
+    parser.add_argument('dataset')
+    parser.add_argument('out',nargs='?',default=os.path.join('..','Streamlit_Frontend','fallback_recipes.npz'))
+    parser.add_argument('--size',type=int,default=2000)
+    args=parser.parse_args()
+    print(f'Wrote {build_fallback_db(args.dataset,args.out,args.size)} recipes to {args.out}')
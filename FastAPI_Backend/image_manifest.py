@@ -0,0 +1,121 @@
+"""Offline job that resolves an image link for every recipe in an engine artifact.
+
+Links come from the dataset's ``Images`` column first and, for recipes without
+one, from an optional pluggable resolver given as ``module:function`` (any
+callable taking a recipe name and returning a URL). Rows are processed in
+chunks across worker processes; each finished chunk is written to
+``<artifact>/image_manifest/part-NNNNN.json``, so an interrupted run resumes
+where it stopped. Once every chunk exists the links are added to the artifact
+as an ``image_link`` column, which ``RecommenderEngine.recipes`` then returns
+with each recipe.
+
+    PYTHONPATH=../Streamlit_Frontend python image_manifest.py \\
+        ../Data/dataset.csv ../Data/engine_artifact \\
+        --resolver ImageFinder.ImageFinder:get_images_links --processes 8
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+from multiprocessing import Pool
+
+from artifact import add_string_column
+from columns import StringColumn,parse_r_list
+from data_loader import load_recipes
+
+PARTS_DIR='image_manifest'
+
+
+def dataset_image(value):
+    """First image URL in an ``Images`` value (``c("url", ...)``, ``"url"`` or bare)."""
+    links=parse_r_list(value)
+    if not links and isinstance(value,str) and value.startswith('http'):
+        links=[value]
+    return links[0] if links else None
+
+
+def load_resolver(spec):
+    if not spec:
+        return None
+    module_name,function_name=spec.split(':')
+    return getattr(importlib.import_module(module_name),function_name)
+
+
+def resolve_chunk(task):
+    part_path,names,images,resolver_spec=task
+    resolver=load_resolver(resolver_spec)
+    links=[]
+    for name,image in zip(names,images):
+        link=dataset_image(image)
+        if link is None and resolver is not None and isinstance(name,str):
+            try:
+                link=resolver(name)
+            except Exception:
+                link=None
+            # Resolvers may answer with a placeholder (e.g. a data: URI) on a miss
+            if not (isinstance(link,str) and link.startswith('http')):
+                link=None
+        links.append(link)
+    tmp_path=part_path+'.tmp'
+    with open(tmp_path,'w') as f:
+        json.dump(links,f)
+    os.replace(tmp_path,part_path)
+    return part_path
+
+
+def recipes_fingerprint(names,images):
+    """Hash of the names and images the chunks are resolved from."""
+    return hashlib.sha256(json.dumps([names,images]).encode('utf-8')).hexdigest()
+
+
+def build_image_manifest(dataset_path,artifact_path,resolver=None,processes=None,chunk_size=1000):
+    recipes=load_recipes(dataset_path,columns=['Name','Images'])
+    names=recipes['Name'].tolist()
+    images=recipes['Images'].tolist() if 'Images' in recipes else [None]*len(names)
+    parts_dir=os.path.join(artifact_path,PARTS_DIR)
+    os.makedirs(parts_dir,exist_ok=True)
+    # Chunks from an earlier run are only reusable if they were cut the same way from the same recipes
+    layout={'n_recipes':len(names),'chunk_size':chunk_size,'fingerprint':recipes_fingerprint(names,images)}
+    layout_path=os.path.join(parts_dir,'layout.json')
+    if os.path.exists(layout_path):
+        with open(layout_path) as f:
+            previous=json.load(f)
+        if previous!=layout:
+            raise ValueError(f'{parts_dir} was started with {previous}, not {layout}; '
+                             'remove it if the dataset changed, else rerun with the same chunk size')
+    else:
+        with open(layout_path,'w') as f:
+            json.dump(layout,f)
+
+    part_paths=[]
+    tasks=[]
+    for part,start in enumerate(range(0,len(names),chunk_size)):
+        part_path=os.path.join(parts_dir,f'part-{part:05d}.json')
+        part_paths.append(part_path)
+        if not os.path.exists(part_path):
+            tasks.append((part_path,names[start:start+chunk_size],images[start:start+chunk_size],resolver))
+    print(f'{len(part_paths)-len(tasks)}/{len(part_paths)} chunks already resolved')
+
+    with Pool(processes) as pool:
+        for done,part_path in enumerate(pool.imap_unordered(resolve_chunk,tasks),1):
+            print(f'[{done}/{len(tasks)}] {os.path.basename(part_path)}')
+
+    links=[]
+    for part_path in part_paths:
+        with open(part_path) as f:
+            links.extend(json.load(f))
+    add_string_column(artifact_path,'image_link',StringColumn.from_values(links))
+    found=sum(link is not None for link in links)
+    print(f'Added image links for {found}/{len(links)} recipes to {artifact_path}')
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Resolve recipe image links into an engine artifact')
+    parser.add_argument('dataset')
+    parser.add_argument('artifact')
+    parser.add_argument('--resolver',help='module:function called with a recipe name for recipes without images')
+    parser.add_argument('--processes',type=int,default=None)
+    parser.add_argument('--chunk-size',type=int,default=1000)
+    args=parser.parse_args()
+    build_image_manifest(args.dataset,args.artifact,args.resolver,args.processes,args.chunk_size)
@@ -1,14 +1,192 @@
-from fastapi import FastAPI
+import os
+import re
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
 
-app = FastAPI()
+from artifact import open_engine
+from batcher import MicroBatcher
+from cache import ResponseCache, request_key
+from executor import Saturated, SearchExecutor
+from ingredient_index import is_plain_term, term_pattern
+from model import NUTRITION_COLUMNS
+from wire_format import NegotiatedRoute, dumps_json, media_quality, negotiated_response
+
+DATASET_PATH = os.environ.get(
+    "RECIPES_DATASET",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "dataset.csv"),
+)
+# Prebuilt engine (see artifact.py); used instead of the dataset when present
+ARTIFACT_PATH = os.environ.get(
+    "RECOMMENDER_ARTIFACT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "engine_artifact"),
+)
+# "sklearn" (NearestNeighbors), "matmul" (normalised float32 matrix product)
+# or "ivf" (approximate: scans only the clusters closest to each query)
+SEARCH_BACKEND = os.environ.get("RECOMMENDER_BACKEND", "sklearn")
+# IVF cluster count and clusters scanned per query (more probes: higher recall, slower)
+BACKEND_OPTIONS = {
+    option: int(os.environ[name])
+    for option, name in (("n_lists", "RECOMMENDER_IVF_LISTS"), ("n_probe", "RECOMMENDER_IVF_PROBES"))
+    if SEARCH_BACKEND == "ivf" and name in os.environ
+}
+# Prebuilt sub-indexes for common filters (see partitions.py); RECOMMENDER_PARTITIONS=0 disables them
+PARTITION_TOP_N = int(os.environ.get("RECOMMENDER_PARTITION_TOP_N", 20))
+PARTITIONS = (
+    {"n_frequent": PARTITION_TOP_N, "n_categories": PARTITION_TOP_N}
+    if os.environ.get("RECOMMENDER_PARTITIONS", "1") != "0"
+    else None
+)
+# Repeated queries (the Streamlit sliders move in fixed steps) skip the search
+response_cache = ResponseCache(
+    max_size=int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 600)),
+)
+# Searches run off the event loop in "thread" or "process" workers; beyond
+# RECOMMENDER_MAX_PENDING queued searches, requests get a 503 right away
+SEARCH_EXECUTOR = os.environ.get("RECOMMENDER_EXECUTOR", "thread")
+SEARCH_WORKERS = int(os.environ.get("RECOMMENDER_WORKERS", 0)) or None
+SEARCH_MAX_PENDING = int(os.environ.get("RECOMMENDER_MAX_PENDING", 0)) or None
+# Seconds the process workers get to open their engines before startup fails
+SEARCH_START_TIMEOUT = float(os.environ.get("RECOMMENDER_WORKER_START_TIMEOUT", 600))
+# Concurrent /predict misses arriving within the window are searched as one batch
+BATCH_WINDOW_MS = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", 2))
+BATCH_MAX_SIZE = int(os.environ.get("PREDICT_BATCH_SIZE", 64))
+# Largest n_neighbors a request may ask for
+MAX_NEIGHBORS = int(os.environ.get("PREDICT_MAX_NEIGHBORS", 100))
+# /predict and /predict_batch bodies from this size on are sent gzip/brotli compressed
+COMPRESS_MIN_BYTES = int(os.environ.get("PREDICT_COMPRESS_MIN_BYTES", 1024))
+
+
+# -------- Model Loading --------
+def load_engine():
+    try:
+        # Process workers search their own engines (with partitions); this one only builds responses
+        partitions = PARTITIONS if SEARCH_EXECUTOR == "thread" else None
+        engine = open_engine(ARTIFACT_PATH, DATASET_PATH, SEARCH_BACKEND, BACKEND_OPTIONS, partitions)
+        app.state.executor.start(SEARCH_START_TIMEOUT)
+        app.state.engine = engine
+    except Exception as e:
+        app.state.engine_error = str(e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm the engine (and any search worker processes) in the background so /health can report progress
+    app.state.engine = None
+    app.state.engine_error = None
+    app.state.executor = SearchExecutor(
+        SEARCH_EXECUTOR,
+        workers=SEARCH_WORKERS,
+        max_pending=SEARCH_MAX_PENDING,
+        artifact_path=ARTIFACT_PATH,
+        dataset_path=DATASET_PATH,
+        backend=SEARCH_BACKEND,
+        backend_options=BACKEND_OPTIONS,
+        partitions=PARTITIONS,
+    )
+    app.state.batcher = MicroBatcher(run_search, window=BATCH_WINDOW_MS / 1000, max_batch=BATCH_MAX_SIZE)
+    threading.Thread(target=load_engine, daemon=True).start()
+    yield
+    app.state.executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+# Request bodies may be JSON or MessagePack (see wire_format.py)
+app.router.route_class = NegotiatedRoute
+
+
+def get_engine():
+    engine = app.state.engine
+    if engine is None:
+        raise HTTPException(status_code=503, detail=app.state.engine_error or "Model is loading")
+    return engine
+
 
 # -------- Request Model --------
 class PredictRequest(BaseModel):
-    nutrition_input: List[int]
-    ingredients: List[str]
-    params: dict
+    nutrition_input: List[float]
+    ingredients: List[str] = []
+    # Only recipes of this RecipeCategory / within the notebook's "healthy" limits
+    category: Optional[str] = None
+    healthy: bool = False
+    params: dict = {}
+
+
+class BatchItem(BaseModel):
+    nutrition_input: List[float]
+    ingredients: List[str] = []
+    category: Optional[str] = None
+    healthy: bool = False
+
+
+class BatchPredictRequest(BaseModel):
+    items: List[BatchItem]
+    params: dict = {}
+
+
+def check_nutrition_input(nutrition_input):
+    if len(nutrition_input) != len(NUTRITION_COLUMNS):
+        raise HTTPException(
+            status_code=422,
+            detail=f"nutrition_input must have {len(NUTRITION_COLUMNS)} values",
+        )
+
+
+def check_ingredients(ingredients):
+    # Terms with regex syntax are matched as patterns; reject malformed ones before searching
+    for term in ingredients:
+        if not is_plain_term(term):
+            try:
+                term_pattern(term)
+            except re.error as e:
+                raise HTTPException(status_code=422, detail=f"Invalid ingredient pattern {term!r}: {e}")
+
+
+def neighbor_params(params):
+    n_neighbors = params.get("n_neighbors", 5)
+    if isinstance(n_neighbors, str) and n_neighbors.strip().isdigit():
+        n_neighbors = int(n_neighbors)
+    if isinstance(n_neighbors, bool) or not isinstance(n_neighbors, int) or not 1 <= n_neighbors <= MAX_NEIGHBORS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"params.n_neighbors must be an integer from 1 to {MAX_NEIGHBORS}",
+        )
+    return {"n_neighbors": n_neighbors, "return_distance": False}
+
+
+async def run_search(engine, method, *args):
+    try:
+        return await app.state.executor.run(engine, method, *args)
+    except Saturated as e:
+        raise HTTPException(status_code=503, detail=f"Service saturated: {e}", headers={"Retry-After": "1"})
+
+
+def ranked_recipes(engine, indices, key):
+    """Build each ranked recipe as it is sent; the full list is cached once all are out."""
+    output = []
+    for index in [] if indices is None else indices:
+        record = engine.recipes([index])[0]
+        output.append(record)
+        yield record
+    response_cache.put(key, output)
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield dumps_json(record) + b"\n"
+
+
+def sse_events(records):
+    count = 0
+    for record in records:
+        count += 1
+        yield b"event: recipe\ndata: " + dumps_json(record) + b"\n\n"
+    yield b"event: end\ndata: " + dumps_json({"count": count}) + b"\n\n"
 
 
 # -------- API --------
@@ -17,103 +195,94 @@ def health_check():
     return {"health_check": "OK"}
 
 
+@app.get("/health")
+def readiness():
+    if app.state.engine is not None:
+        return {"status": "ready", "recipes": app.state.engine.n_recipes}
+    if app.state.engine_error:
+        return JSONResponse(status_code=503, content={"status": "error", "detail": app.state.engine_error})
+    return JSONResponse(status_code=503, content={"status": "loading"})
+
+
+@app.get("/stats")
+def stats():
+    return {
+        "cache": response_cache.stats(),
+        "executor": app.state.executor.stats(),
+        "batcher": app.state.batcher.stats(),
+    }
+
+
 @app.post("/predict")
-def predict(data: PredictRequest):
-    # Dummy recommendations (safe format)
-    recipes = [
-        {
-            "Name": "Grilled Chicken Bowl",
-            "Calories": 350,
-            "Protein": 40,
-            "Carbs": 20,
-            "Fat": 10
-        },
-        {
-            "Name": "Vegetable Omelette",
-            "Calories": 280,
-            "Protein": 25,
-            "Carbs": 10,
-            "Fat": 15
-        },
-        {
-            "Name": "Rice & Broccoli",
-            "Calories": 300,
-            "Protein": 12,
-            "Carbs": 50,
-            "Fat": 5
-        },
-        {
-            "Name": "Quinoa Salad",
-            "Calories": 250,
-            "Protein": 8,
-            "Carbs": 40,
-            "Fat": 8
-        },
-        {
-            "Name": "Tofu Stir-fry",
-            "Calories": 400,
-            "Protein": 30,
-            "Carbs": 30,
-            "Fat": 12
-        },
-        {
-        
-            "Name": "Lentil Soup",
-            "Calories": 220,
-            "Protein": 18,
-            "Carbs": 35,
-            "Fat": 4
-        },
-        {
-            "Name": "Greek Yogurt Parfait",
-            "Calories": 200,
-            "Protein": 15,
-            "Carbs": 25,
-            "Fat": 2
-        },
-        {
-            "Name": "Salmon with Asparagus",
-            "Calories": 450,
-            "Protein": 35,
-            "Carbs": 15,
-            "Fat": 20
-        },
-        {
-            "Name": "Turkey Wrap",
-            "Calories": 320,
-            "Protein": 28,
-            "Carbs": 30,
-            "Fat": 8
-        },
-        {
-            "Name": "Chickpea Curry",
-            "Calories": 380,
-            "Protein": 22,
-            "Carbs": 45,
-            "Fat": 10
-        },
-        {
-            "Name": "Vegetable Stir-fry",
-            "Calories": 280,
-            "Protein": 10,
-            "Carbs": 35,
-            "Fat": 12
-        },
-        {
-            "Name": "Beef and Veggie Skewers",
-            "Calories": 400,
-            "Protein": 38,
-            "Carbs": 15,
-            "Fat": 18
-        },
-        {"Name": "Pasta Primavera",
-            "Calories": 360,    
-            "Protein": 12,
-            "Carbs": 50,
-            "Fat": 10
-        }
+async def predict(data: PredictRequest, request: Request):
+    """Ranked recipes as JSON, or MessagePack for clients that accept ``application/msgpack``."""
+    engine = get_engine()
+    check_nutrition_input(data.nutrition_input)
+    check_ingredients(data.ingredients)
+    params = neighbor_params(data.params)
+    key = request_key(data.nutrition_input, data.ingredients, params["n_neighbors"], data.category, data.healthy)
+    output = response_cache.get(key)
+    if output is None:
+        output = await app.state.batcher.recommend(
+            engine, data.nutrition_input, data.ingredients, params, data.category, data.healthy
+        ) or []
+        response_cache.put(key, output)
+    return negotiated_response(request, {"output": output}, COMPRESS_MIN_BYTES)
+
+
+@app.post("/predict/stream")
+async def predict_stream(data: PredictRequest, request: Request):
+    """``/predict`` sent one recipe at a time, best first.
+
+    Newline-delimited JSON (one recipe per line) by default, or server-sent
+    events (``recipe`` events, then an ``end`` event with the count) when the
+    client accepts ``text/event-stream``.
+    """
+    engine = get_engine()
+    check_nutrition_input(data.nutrition_input)
+    check_ingredients(data.ingredients)
+    params = neighbor_params(data.params)
+    key = request_key(data.nutrition_input, data.ingredients, params["n_neighbors"], data.category, data.healthy)
+    records = response_cache.get(key)
+    if records is None:
+        indices = await run_search(
+            engine, "neighbors", data.nutrition_input, data.ingredients, params["n_neighbors"], data.category, data.healthy
+        )
+        records = ranked_recipes(engine, indices, key)
+    if media_quality(request.headers.get("accept", ""), "text/event-stream", explicit=True) > 0:
+        return StreamingResponse(sse_events(records), media_type="text/event-stream")
+    return StreamingResponse(ndjson_lines(records), media_type="application/x-ndjson")
+
+
+@app.post("/predict_batch")
+async def predict_batch(data: BatchPredictRequest, request: Request):
+    engine = get_engine()
+    for item in data.items:
+        check_nutrition_input(item.nutrition_input)
+        check_ingredients(item.ingredients)
+    params = neighbor_params(data.params)
+    keys = [
+        request_key(item.nutrition_input, item.ingredients, params["n_neighbors"], item.category, item.healthy)
+        for item in data.items
     ]
-    return {"output": recipes}
+    outputs = [response_cache.get(key) for key in keys]
+    misses = [i for i, output in enumerate(outputs) if output is None]
+    if misses:
+        results = await run_search(
+            engine,
+            "recommend_batch",
+            [data.items[i].nutrition_input for i in misses],
+            [data.items[i].ingredients for i in misses],
+            params,
+            [data.items[i].category for i in misses],
+            [data.items[i].healthy for i in misses],
+        )
+        for i, output in zip(misses, results):
+            if isinstance(output, Exception):
+                raise output
+            outputs[i] = output or []
+            response_cache.put(keys[i], outputs[i])
+    return negotiated_response(request, {"output": outputs}, COMPRESS_MIN_BYTES)
 
 # ================= TEST RUN (OPTIONAL) =================
 if __name__ == "__main__":
@@ -1,9 +1,27 @@
 import numpy as np
+import pandas as pd
 import re
 from sklearn.preprocessing import StandardScaler
 from sklearn.neighbors import NearestNeighbors
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import FunctionTransformer
+from sklearn.preprocessing import normalize
+from sklearn.metrics.pairwise import cosine_distances
+from ingredient_index import IngredientIndex,is_plain_term
+from columns import StringColumn,StringListColumn
+from partitions import COMMON_INGREDIENTS,Partition,frequent_terms,healthy_rows,intersect
+
+NUTRITION_COLUMNS=['Calories','FatContent','SaturatedFatContent','CholesterolContent','SodiumContent',
+                   'CarbohydrateContent','FiberContent','SugarContent','ProteinContent']
+LIST_COLUMNS=['RecipeIngredientParts','RecipeInstructions']
+# Upper bound on the query x candidate distance matrix computed at once
+MAX_DISTANCE_CELLS=1<<24
+
+def read_dataset(path,**kwargs):
+    # Data/dataset.csv is shipped gzip-compressed despite its extension
+    with open(path,'rb') as f:
+        compression='gzip' if f.read(2)==b'\x1f\x8b' else None
+    return pd.read_csv(path,compression=compression,**kwargs)
 
 def scaling(dataframe):
     scaler=StandardScaler()
@@ -60,4 +78,310 @@ def output_recommended_recipes(dataframe):
         output=None
     return output
 
+def build_columns(dataframe):
+    """Column name -> numpy array, StringColumn or StringListColumn (for LIST_COLUMNS)."""
+    columns={}
+    for name in dataframe.columns:
+        values=dataframe[name]
+        if name in LIST_COLUMNS:
+            columns[name]=StringListColumn.from_r_strings(values.tolist())
+        elif pd.api.types.is_numeric_dtype(values):
+            columns[name]=values.to_numpy()
+        else:
+            columns[name]=StringColumn.from_values(values.tolist())
+    return columns
+
+def top_k_indices(scores,k):
+    """Column indices of the ``k`` highest scores per row, best first, ties broken by index."""
+    if k<scores.shape[1]:
+        top=np.argpartition(-scores,k-1,axis=1)[:,:k]
+    else:
+        top=np.tile(np.arange(scores.shape[1]),(scores.shape[0],1))
+    top.sort(axis=1)
+    order=np.argsort(-np.take_along_axis(scores,top,axis=1),axis=1,kind='stable')
+    return np.take_along_axis(top,order,axis=1)
+
+def unit_rows(prep_data):
+    """L2-normalised rows as a contiguous float32 matrix."""
+    return np.ascontiguousarray(normalize(prep_data),dtype=np.float32)
+
+class SklearnBackend:
+    """Exact cosine search through sklearn's brute-force ``NearestNeighbors``."""
+    def __init__(self,prep_data,unit=None):
+        self.prep_data=prep_data
+        self.neigh=nn_predictor(prep_data)
+
+    def search(self,queries,n_neighbors,candidates=None):
+        if candidates is None:
+            return self.neigh.kneighbors(queries,n_neighbors,return_distance=False)
+        candidate_data=self.prep_data[candidates]
+        chunk=max(1,MAX_DISTANCE_CELLS//candidates.shape[0])
+        return np.concatenate([
+            candidates[np.argsort(cosine_distances(queries[i:i+chunk],candidate_data),axis=1,kind='stable')[:,:n_neighbors]]
+            for i in range(0,queries.shape[0],chunk)])
+
+class MatmulBackend:
+    """Exact cosine search as one matrix product over pre-normalised rows.
+
+    Rows are L2-normalised once into a contiguous float32 matrix, so cosine
+    similarity to a batch of queries is a single ``@`` and the top-k an
+    ``argpartition``; rankings match ``SklearnBackend`` up to float32 ties.
+    """
+    def __init__(self,prep_data,unit=None):
+        self.unit=unit_rows(prep_data) if unit is None else unit
+
+    def search(self,queries,n_neighbors,candidates=None):
+        unit_queries=normalize(queries).astype(np.float32)
+        data=self.unit if candidates is None else self.unit[candidates]
+        chunk=max(1,MAX_DISTANCE_CELLS//data.shape[0])
+        indices=np.concatenate([top_k_indices(unit_queries[i:i+chunk]@data.T,n_neighbors)
+                                for i in range(0,unit_queries.shape[0],chunk)])
+        return indices if candidates is None else candidates[indices]
+
+def spherical_kmeans(unit,n_clusters,n_iter=10,seed=0,sample_per_cluster=256):
+    """Unit-norm centroids of ``unit`` rows under cosine similarity, trained on a seeded sample."""
+    rng=np.random.default_rng(seed)
+    n=unit.shape[0]
+    sample=np.asarray(unit[np.sort(rng.choice(n,min(n,n_clusters*sample_per_cluster),replace=False))],dtype=np.float32)
+    centroids=sample[rng.choice(sample.shape[0],n_clusters,replace=False)]
+    for _ in range(n_iter):
+        assignment=nearest_centroid(sample,centroids)
+        sums=np.zeros_like(centroids)
+        np.add.at(sums,assignment,sample)
+        # Clusters that lost every member keep their previous centroid
+        filled=np.bincount(assignment,minlength=n_clusters)>0
+        centroids[filled]=normalize(sums[filled])
+    return centroids
+
+def nearest_centroid(unit,centroids):
+    chunk=max(1,MAX_DISTANCE_CELLS//centroids.shape[0])
+    return np.concatenate([np.argmax(unit[i:i+chunk]@centroids.T,axis=1)
+                           for i in range(0,unit.shape[0],chunk)])
+
+class IVFBackend(MatmulBackend):
+    """Approximate cosine search over an inverted file of k-means clusters.
+
+    Rows are grouped under ``n_lists`` spherical k-means centroids (default
+    ``sqrt(n)``); a query is scored exactly against the rows of its
+    ``n_probe`` closest clusters only. ``n_probe`` is the recall/latency
+    knob: ``n_lists`` makes the search exact, small values scan a fraction
+    of the matrix. It can be changed on a live backend. Queries restricted
+    to ``candidates`` (ingredient filters) are searched exactly. ``lists``
+    are prebuilt ``build_lists`` arrays (memory-mapped from an artifact) used
+    instead of clustering.
+    """
+    def __init__(self,prep_data,unit=None,n_lists=None,n_probe=None,seed=0,lists=None):
+        super().__init__(prep_data,unit)
+        self.centroids,self.list_rows,self.list_offsets,self.list_unit=lists or self.build_lists(self.unit,n_lists,seed)
+        self.n_lists=self.centroids.shape[0]
+        self.n_probe=n_probe or max(1,self.n_lists//16)
+
+    @staticmethod
+    def build_lists(unit,n_lists=None,seed=0):
+        """Centroids, rows in cluster order, each cluster's offset into them, and their vectors in that order."""
+        n=unit.shape[0]
+        n_lists=max(1,min(n,n_lists or int(np.sqrt(n))))
+        centroids=spherical_kmeans(unit,n_lists,seed=seed)
+        assignment=nearest_centroid(unit,centroids)
+        list_rows=np.argsort(assignment,kind='stable').astype(np.int64)
+        list_offsets=np.zeros(n_lists+1,dtype=np.int64)
+        np.cumsum(np.bincount(assignment,minlength=n_lists),out=list_offsets[1:])
+        # Rows stored cluster by cluster, so each probed list is one contiguous slice
+        return centroids,list_rows,list_offsets,np.ascontiguousarray(unit[list_rows])
+
+    def search(self,queries,n_neighbors,candidates=None):
+        if candidates is not None or self.n_probe>=self.n_lists:
+            return super().search(queries,n_neighbors,candidates)
+        unit_queries=normalize(queries).astype(np.float32)
+        probes=top_k_indices(unit_queries@self.centroids.T,self.n_probe)
+        results=[]
+        for query,lists in zip(unit_queries,probes):
+            slices=[slice(self.list_offsets[l],self.list_offsets[l+1]) for l in lists]
+            rows=np.concatenate([self.list_rows[s] for s in slices])
+            if rows.shape[0]<n_neighbors:
+                results.append(super().search(query[None,:],n_neighbors)[0])
+                continue
+            scores=np.concatenate([self.list_unit[s]@query for s in slices])
+            results.append(rows[top_k_indices(scores[None,:],n_neighbors)[0]])
+        return np.array(results).reshape(-1,n_neighbors)
+
+BACKENDS={'sklearn':SklearnBackend,'matmul':MatmulBackend,'ivf':IVFBackend}
+
+class RecommenderEngine:
+    """Scaler and neighbour index fitted once over the whole dataset.
+
+    ``recommend`` answers queries against these prebuilt structures; an
+    ingredient filter only restricts the candidate rows, looked up in an
+    ``IngredientIndex``, instead of refitting. The search itself is delegated
+    to one of ``BACKENDS``. Recipe fields are parsed into compact columns at
+    load so responses are built by slicing them. Common filters can be
+    given prebuilt sub-indexes with ``build_partitions``.
+    """
+    def __init__(self,scaler,prep_data,ingredient_index,columns,backend='sklearn',unit=None,backend_options=None):
+        self.n_recipes=prep_data.shape[0]
+        self.scaler=scaler
+        self.prep_data=prep_data
+        self.backend=BACKENDS[backend](prep_data,unit,**(backend_options or {}))
+        self.ingredient_index=ingredient_index
+        self.columns=columns
+        self.partitions={}
+        self._category_codes=None
+        self._healthy_rows=None
+
+    @classmethod
+    def from_dataframe(cls,dataframe,backend='sklearn',backend_options=None):
+        dataframe=dataframe.reset_index(drop=True)
+        scaler=StandardScaler()
+        prep_data=scaler.fit_transform(dataframe[NUTRITION_COLUMNS].to_numpy())
+        return cls(scaler,prep_data,IngredientIndex.from_series(dataframe['RecipeIngredientParts']),
+                   build_columns(dataframe),backend,backend_options=backend_options)
+
+    def _partition(self,rows,unit=None):
+        """A ``Partition`` of ``rows``; matmul-based engines may pass their (e.g. mapped) ``unit`` rows."""
+        # IVF clustering per partition is not worth it; partitions are searched exactly
+        if isinstance(self.backend,MatmulBackend):
+            return Partition(rows,MatmulBackend(None,self.backend.unit[rows] if unit is None else unit))
+        return Partition(rows,type(self.backend)(np.asarray(self.prep_data[rows])))
+
+    def build_partitions(self,terms=COMMON_INGREDIENTS,n_frequent=20,n_categories=20,healthy=True):
+        """Prebuild sub-indexes for ``terms`` and the ``n_frequent`` most common ingredients,
+        the ``n_categories`` largest ``RecipeCategory`` values and the healthy filter."""
+        partitions={}
+        for term in dict.fromkeys([*terms,*frequent_terms(self.ingredient_index,n_frequent)]):
+            rows=self.ingredient_index.lookup(term)
+            if rows.shape[0]>0:
+                partitions[('ingredient',term.lower())]=self._partition(rows)
+        codes=self.category_codes()
+        if codes is not None and n_categories>0:
+            categories,inverse=codes
+            counts=np.bincount(inverse,minlength=len(categories))
+            for code in np.argsort(-counts,kind='stable')[:n_categories]:
+                if categories[code] is not None:
+                    partitions[('category',categories[code])]=self._partition(np.flatnonzero(inverse==code))
+        if healthy:
+            rows=self.healthy_rows()
+            if rows.shape[0]>0:
+                partitions[('healthy',)]=self._partition(rows)
+        self.partitions=partitions
+
+    def category_codes(self):
+        """Distinct ``RecipeCategory`` values and each row's position among them (None without the column)."""
+        if self._category_codes is None and 'RecipeCategory' in self.columns:
+            values=self.columns['RecipeCategory'].take(range(self.n_recipes))
+            categories={}
+            inverse=np.array([categories.setdefault(value,len(categories)) for value in values],dtype=np.int32)
+            self._category_codes=(list(categories),inverse)
+        return self._category_codes
+
+    def healthy_rows(self):
+        """Rows within the healthy limits, computed on first use (unscaling the whole matrix) and kept."""
+        if self._healthy_rows is None:
+            self._healthy_rows=healthy_rows(self.scaler.inverse_transform(np.asarray(self.prep_data)),NUTRITION_COLUMNS)
+        return self._healthy_rows
+
+    def select(self,ingredients=[],category=None,healthy=False):
+        """Rows a filtered query ranks: None (all), a prebuilt ``Partition`` or a sorted row array."""
+        parts=[]
+        for term in sorted(set(ingredients)):
+            part=self.partitions.get(('ingredient',term.lower())) if is_plain_term(term) else None
+            parts.append(part if part is not None else self.ingredient_index.lookup(term))
+        if category is not None:
+            part=self.partitions.get(('category',category))
+            if part is None:
+                codes=self.category_codes()
+                if codes is None or category not in codes[0]:
+                    part=np.empty(0,dtype=np.int64)
+                else:
+                    part=np.flatnonzero(codes[1]==codes[0].index(category))
+            parts.append(part)
+        if healthy:
+            part=self.partitions.get(('healthy',))
+            parts.append(part if part is not None else self.healthy_rows())
+        if not parts:
+            return None
+        return parts[0] if len(parts)==1 else intersect(parts)
+
+    def kneighbors(self,_input,n_neighbors=5,candidates=None):
+        """Row positions of the ``n_neighbors`` closest recipes, or None if there are fewer candidates."""
+        return self.kneighbors_batch([_input],n_neighbors,[candidates])[0]
+
+    def kneighbors_batch(self,inputs,n_neighbors=5,candidates_list=None):
+        """``kneighbors`` for many queries: one scaling pass, one search per distinct candidate set.
+
+        Queries are grouped by candidate object (None for unfiltered) and each
+        group goes as a single batch to the backend, or to its ``Partition``.
+        """
+        queries=self.scaler.transform(np.asarray(inputs,dtype=float).reshape(-1,len(NUTRITION_COLUMNS)))
+        if candidates_list is None:
+            candidates_list=[None]*queries.shape[0]
+        results=[None]*queries.shape[0]
+        groups={}
+        for i,candidates in enumerate(candidates_list):
+            groups.setdefault(None if candidates is None else id(candidates),(candidates,[]))[1].append(i)
+        for candidates,rows in groups.values():
+            available=self.n_recipes if candidates is None else len(candidates)
+            if available<n_neighbors:
+                continue
+            if isinstance(candidates,Partition):
+                indices=candidates.search(queries[rows],n_neighbors)
+            else:
+                indices=self.backend.search(queries[rows],n_neighbors,candidates)
+            for row,row_indices in zip(rows,indices):
+                results[row]=row_indices
+        return results
+
+    def recipes(self,indices):
+        """Output records for the given rows, in the format of ``output_recommended_recipes``.
+
+        Missing numbers (NaN, e.g. ``AggregatedRating`` of unrated recipes) become None, since NaN is not JSON.
+        """
+        records=[{} for _ in indices]
+        for name,column in self.columns.items():
+            values=column[indices].tolist() if isinstance(column,np.ndarray) else column.take(indices)
+            if isinstance(column,np.ndarray) and column.dtype.kind=='f':
+                values=[None if value!=value else value for value in values]
+            for record,value in zip(records,values):
+                record[name]=value
+        return records
+
+    def neighbors(self,_input,ingredients=[],n_neighbors=5,category=None,healthy=False):
+        """Ranked row positions for one filtered query, or None if too few recipes match."""
+        return self.kneighbors(_input,n_neighbors,self.select(ingredients,category,healthy))
+
+    def recommend(self,_input,ingredients=[],params={'n_neighbors':5,'return_distance':False},category=None,healthy=False):
+        indices=self.neighbors(_input,ingredients,params.get('n_neighbors',5),category,healthy)
+        if indices is None:
+            return None
+        return self.recipes(indices)
+
+    def recommend_batch(self,inputs,ingredients_list,params={'n_neighbors':5,'return_distance':False},
+                        categories=None,healthy_list=None):
+        """``recommend`` for many queries at once, results in request order.
 
+        A query whose filter cannot be resolved (e.g. an invalid regex term)
+        gets the exception in its place; the other queries are still answered.
+        """
+        categories=categories or [None]*len(inputs)
+        healthy_list=healthy_list or [False]*len(inputs)
+        # Queries sharing a filter share one candidate object, and with it one search
+        filters={}
+        results=[None]*len(inputs)
+        searched=[]
+        candidates_list=[]
+        for i,(ingredients,category,healthy) in enumerate(zip(ingredients_list,categories,healthy_list)):
+            key=(tuple(sorted(set(ingredients))),category,bool(healthy))
+            if key not in filters:
+                try:
+                    filters[key]=self.select(*key)
+                except Exception as e:
+                    filters[key]=e
+            if isinstance(filters[key],Exception):
+                results[i]=filters[key]
+            else:
+                searched.append(i)
+                candidates_list.append(filters[key])
+        if searched:
+            indices_list=self.kneighbors_batch([inputs[i] for i in searched],params.get('n_neighbors',5),candidates_list)
+            for i,indices in zip(searched,indices_list):
+                results[i]=None if indices is None else self.recipes(indices)
+        return results
@@ -0,0 +1,79 @@
+"""Prebuilt search indexes for the filters users apply most often.
+
+Most filtered queries use one of a few filters: an ingredient button from the
+Streamlit pages' ``FOOD_CATEGORIES``, a frequent ingredient, a
+``RecipeCategory``, or the notebook's "healthy" limits. For each of these
+``RecommenderEngine.build_partitions`` keeps a ``Partition``: the matching
+rows with their own contiguous search backend. Such a query then ranks
+that partition directly, with no filtering pass and no gather of candidate
+rows.
+
+Partitions hold copies of their rows' vectors, about five times the
+dataset's matrix for the default set. Built at startup they are private to
+each process. Saved in an engine artifact (``artifact.py`` does this by
+default) they are memory-mapped like the rest of it, so matmul and ivf
+workers share them; sklearn partitions are always fitted per process.
+"""
+import numpy as np
+
+from ingredient_index import is_plain_term
+
+# Ingredient buttons of the Streamlit pages (FOOD_CATEGORIES)
+COMMON_INGREDIENTS=['chicken','beef','fish','shrimp','egg','tofu','lentils','beans',
+                    'rice','pasta','potato','bread','flour','quinoa','oats','corn',
+                    'tomato','onion','garlic','spinach','broccoli','carrot','bell pepper','mushroom','avocado',
+                    'cheese','milk','butter','yogurt','cream',
+                    'salt','pepper','sugar','honey','soy sauce','vinegar','olive oil','spices',
+                    'lemon','lime','orange','apple','banana','berries']
+# The notebook's max_list, keyed by column (the notebook lists Sugar, Protein and Fiber in another order)
+HEALTHY_MAX={'Calories':500,'FatContent':20,'SaturatedFatContent':10,'CholesterolContent':300,'SodiumContent':800,
+             'CarbohydrateContent':60,'SugarContent':25,'ProteinContent':30,'FiberContent':10}
+
+
+class Partition:
+    """Sorted rows of one filter and a backend built over just those rows."""
+    def __init__(self,rows,backend):
+        self.rows=rows
+        self.backend=backend
+
+    def __len__(self):
+        return self.rows.shape[0]
+
+    def search(self,queries,n_neighbors):
+        return self.rows[self.backend.search(queries,n_neighbors)]
+
+
+def partition_rows(part):
+    return part.rows if isinstance(part,Partition) else part
+
+
+def intersect(parts):
+    """Rows in every part (``Partition`` or row array), smallest first."""
+    parts=sorted(parts,key=len)
+    rows=partition_rows(parts[0])
+    for other in parts[1:]:
+        if rows.shape[0]==0:
+            break
+        rows=np.intersect1d(rows,partition_rows(other),assume_unique=True)
+    return rows
+
+
+def healthy_rows(nutrition,columns):
+    """Rows whose raw nutrition values are all below ``HEALTHY_MAX``."""
+    mask=np.ones(nutrition.shape[0],dtype=bool)
+    for j,name in enumerate(columns):
+        mask&=nutrition[:,j]<HEALTHY_MAX[name]
+    return np.flatnonzero(mask)
+
+
+def frequent_terms(ingredient_index,n):
+    """The ``n`` ingredient segments found in the most recipes."""
+    sizes=np.array([postings.shape[0] for postings in ingredient_index.postings])
+    terms=[]
+    for i in np.argsort(-sizes,kind='stable'):
+        if len(terms)>=n:
+            break
+        term=ingredient_index.vocabulary[i].strip()
+        if is_plain_term(term) and term.isprintable() and any(c.isalpha() for c in term):
+            terms.append(term)
+    return terms
@@ -0,0 +1,78 @@
+"""Checks ``RecommenderEngine`` against the legacy functions of ``model.py``.
+
+* Ingredient filtering: ``RecommenderEngine.select`` (inverted index and
+  partitions) must return exactly the rows of
+  ``extract_ingredient_filtered_data`` for single plain terms, AND queries
+  and terms with regex syntax.
+* Rankings: on a fixed, seeded query set (recipe nutrition vectors with up to
+  20% noise) the ``sklearn`` and ``matmul`` engines must return the same
+  neighbours, in the same order, as the legacy ``recommend``.
+
+Recipes without ``RecipeIngredientParts`` are dropped first, because the
+legacy filter drops them (and refits its scaler without them) even when no
+ingredient is given. The script exits with status 1 on any mismatch.
+
+    python verify_engine.py ../Data/dataset.csv --queries 100
+"""
+import argparse
+import itertools
+import sys
+
+import numpy as np
+
+from benchmark_ann import legacy_neighbors,query_set
+from data_loader import ENGINE_COLUMNS
+from model import RecommenderEngine,extract_ingredient_filtered_data,read_dataset
+from partitions import COMMON_INGREDIENTS,frequent_terms,partition_rows
+
+REGEX_TERMS=['chick.n','^c\\(','pepper$','(?:salt|sugar)','oliv[e]? oil','\\begg']
+
+
+def ingredient_queries(engine):
+    terms=list(dict.fromkeys([*COMMON_INGREDIENTS,*frequent_terms(engine.ingredient_index,20)]))
+    return [[term] for term in terms+REGEX_TERMS]+[list(pair) for pair in itertools.combinations(terms[:12],2)]
+
+
+def check_filters(dataframe,engine):
+    failures=0
+    queries=ingredient_queries(engine)
+    for ingredients in queries:
+        expected=extract_ingredient_filtered_data(dataframe,ingredients).index.to_numpy()
+        selected=engine.select(ingredients)
+        found=np.empty(0,dtype=np.int64) if selected is None else np.asarray(partition_rows(selected))
+        if not np.array_equal(np.sort(found),expected):
+            failures+=1
+            print(f'filter {ingredients}: {found.shape[0]} rows, legacy {expected.shape[0]}')
+    print(f'filters: {len(queries)-failures}/{len(queries)} match')
+    return failures
+
+
+def check_rankings(engine_data,queries,truth,k):
+    failures=0
+    for backend in ['sklearn','matmul']:
+        engine=RecommenderEngine.from_dataframe(engine_data,backend=backend)
+        same=sum(np.array_equal(engine.kneighbors(query,k),expected) for query,expected in zip(queries,truth))
+        failures+=len(truth)-same
+        print(f'{backend} rankings: {same}/{len(truth)} identical to legacy recommend')
+    return failures
+
+
+def main(dataset_path,n_queries,k):
+    dataframe=read_dataset(dataset_path)
+    dataframe=dataframe.dropna(subset=['RecipeIngredientParts']).reset_index(drop=True)
+    engine_data=dataframe[[name for name in ENGINE_COLUMNS if name in dataframe]]
+    engine=RecommenderEngine.from_dataframe(engine_data,backend='matmul')
+    engine.build_partitions()
+    failures=check_filters(dataframe,engine)
+    queries=query_set(dataframe,n_queries)
+    failures+=check_rankings(engine_data,queries,legacy_neighbors(dataframe,queries,k),k)
+    return failures
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Check the engine against the legacy model functions')
+    parser.add_argument('dataset')
+    parser.add_argument('--queries',type=int,default=100)
+    parser.add_argument('--k',type=int,default=10)
+    args=parser.parse_args()
+    sys.exit(1 if main(args.dataset,args.queries,args.k) else 0)
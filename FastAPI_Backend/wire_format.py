@@ -0,0 +1,163 @@
+"""Body formats and compression negotiated with each client.
+
+JSON stays the default in both directions; it is encoded and decoded with
+orjson when that is installed (the same JSON, several times faster than the
+stdlib). Clients that accept ``application/msgpack`` get MessagePack responses
+and may post MessagePack request bodies, when msgpack is installed. Encoded
+responses of at least ``min_size`` bytes are compressed with brotli (when
+installed) or gzip, whichever the client's ``Accept-Encoding`` allows.
+``Accept`` and ``Accept-Encoding`` entries with ``q=0`` are refused.
+"""
+import gzip
+import json
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+# Fast levels: on recipe lists they compress nearly as well as the maximum
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps_json(content):
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(body):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def is_msgpack(content_type):
+    return content_type.split(";")[0].strip().lower() in MSGPACK_TYPES
+
+
+def parse_accept(header):
+    """``{value: q}`` for the entries of an ``Accept`` or ``Accept-Encoding`` header."""
+    qualities = {}
+    for entry in header.split(","):
+        value, *params = entry.split(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        qualities[value] = quality
+    return qualities
+
+
+def media_quality(accept, media_type, explicit=False):
+    """q the ``Accept`` header gives ``media_type``, from its most specific matching range.
+
+    With ``explicit``, only the media type itself counts, not ``type/*`` or ``*/*``.
+    """
+    qualities = parse_accept(accept)
+    ranges = [media_type] if explicit else [media_type, media_type.split("/")[0] + "/*", "*/*"]
+    return next((qualities[media_range] for media_range in ranges if media_range in qualities), 0.0)
+
+
+def response_media_type(accept):
+    """MessagePack if the client asks for it by name at least as strongly as JSON, else JSON.
+
+    Wildcards never select MessagePack, and an empty ``Accept`` means JSON.
+    """
+    if msgpack is None or not accept.strip():
+        return JSON
+    msgpack_quality = max(media_quality(accept, media_type, explicit=True) for media_type in MSGPACK_TYPES)
+    if msgpack_quality > 0 and msgpack_quality >= media_quality(accept, JSON):
+        return MSGPACK
+    return JSON
+
+
+def encode(content, media_type):
+    return msgpack.packb(content) if media_type == MSGPACK else dumps_json(content)
+
+
+def content_coding(accept_encoding, size, min_size):
+    """``br`` or ``gzip`` for a body of ``size`` bytes, or None to send it as is."""
+    if size < min_size:
+        return None
+    codings = {coding for coding, quality in parse_accept(accept_encoding).items() if quality > 0}
+    if brotli is not None and "br" in codings:
+        return "br"
+    if "gzip" in codings:
+        return "gzip"
+    return None
+
+
+def compress(body, coding):
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def negotiated_response(request, content, min_size=1024):
+    """``content`` encoded (and compressed) as the request's headers ask."""
+    media_type = response_media_type(request.headers.get("accept", ""))
+    body = encode(content, media_type)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    coding = content_coding(request.headers.get("accept-encoding", ""), len(body), min_size)
+    if coding is not None:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type=media_type, headers=headers)
+
+
+class NegotiatedRequest(Request):
+    """Request whose body FastAPI decodes from JSON (via orjson) or MessagePack.
+
+    FastAPI only hands ``application/json`` bodies to ``json()``, so a
+    MessagePack request is presented as JSON and decoded here by its real type.
+    """
+
+    def __init__(self, scope, receive):
+        headers = scope["headers"]
+        content_type = next((value for name, value in headers if name == b"content-type"), b"").decode("latin-1")
+        self.body_type = MSGPACK if is_msgpack(content_type) else JSON
+        if self.body_type == MSGPACK:
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="MessagePack request bodies are not supported")
+            headers = [(name, value) for name, value in headers if name != b"content-type"]
+            scope = {**scope, "headers": headers + [(b"content-type", JSON.encode())]}
+        super().__init__(scope, receive)
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            self._json = msgpack.unpackb(body) if self.body_type == MSGPACK else loads_json(body)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """Route that parses request bodies with ``NegotiatedRequest``."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request):
+            return await handler(NegotiatedRequest(request.scope, request.receive))
+
+        return negotiated_handler
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(_ROOT, "FastAPI_Backend")
+
+# Same settings the FastAPI backend reads, so both load the same artifact
+ARTIFACT_PATH = os.environ.get("RECOMMENDER_ARTIFACT", os.path.join(_ROOT, "Data", "engine_artifact"))
+# Same default as the backend; matmul searches the memory-mapped matrix without a per-process copy
+SEARCH_BACKEND = os.environ.get("RECOMMENDER_BACKEND", "sklearn")
+
+_engines: Dict[Any, Any] = {}
+_lock = threading.Lock()
+
+
+def load_engine(path: str = ARTIFACT_PATH, backend: str = SEARCH_BACKEND, backend_options: Optional[Dict[str, Any]] = None):
+    """
+    The backend's RecommenderEngine for an artifact, loaded once per process
+
+    Uses ``FastAPI_Backend/artifact.py`` directly, so this needs the backend's
+    dependencies (scikit-learn) in the frontend environment.
+
+    Args:
+        path: Engine artifact directory (built with ``artifact.py``)
+        backend: Search backend name (``sklearn``, ``matmul`` or ``ivf``)
+        backend_options: Extra backend arguments, e.g. ``{"n_probe": 8}``
+
+    Returns:
+        RecommenderEngine: Engine shared by the whole process
+
+    Raises:
+        ImportError: If the backend's dependencies are missing
+        FileNotFoundError: If there is no artifact at ``path``
+    """
+    key = (path, backend, tuple(sorted((backend_options or {}).items())))
+    engine = _engines.get(key)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(key)
+            if engine is None:
+                if BACKEND_DIR not in sys.path:
+                    sys.path.append(BACKEND_DIR)
+                from artifact import is_artifact, load_artifact
+                if not is_artifact(path):
+                    raise FileNotFoundError(f"No engine artifact at {path}; build one with FastAPI_Backend/artifact.py")
+                engine = _engines[key] = load_artifact(path, backend=backend, backend_options=backend_options)
+    return engine
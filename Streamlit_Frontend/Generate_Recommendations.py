@@ -1,17 +1,91 @@
+import copy
 import requests
 import json
 import logging
+import os
+import re
+import threading
 import time
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Callable, Iterator, Optional, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dataclasses import dataclass
 import pandas as pd
 import numpy as np
-import random
+
+from EmbeddedEngine import load_engine
+from RecipeDatabase import load_recipe_database
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stages reported to a ``generate(on_progress=...)`` callback, with the share
+# of the work done once each completes. Image resolution happens in the pages,
+# which report "images_resolved" themselves.
+PROGRESS_STAGES = {
+    "health": 0.1,
+    "request_sent": 0.2,
+    "results_received": 0.7,
+    "images_resolved": 1.0,
+}
+ProgressCallback = Callable[[str, float], None]
+
+# "api" (default) asks the FastAPI backend over HTTP; "embedded" loads the
+# backend's engine artifact into this process and searches it directly
+ENGINE_MODE = os.environ.get("RECIPE_ENGINE_MODE", "api")
+
+
+def report_progress(on_progress: Optional[ProgressCallback], stage: str) -> None:
+    """Call ``on_progress(stage, fraction)`` if a callback was given"""
+    if on_progress is not None:
+        on_progress(stage, PROGRESS_STAGES[stage])
+
+
+def report_stream_progress(on_progress: Optional[ProgressCallback], received: int, expected: int) -> None:
+    """Advance from "request_sent" toward "results_received" as streamed recipes arrive"""
+    if on_progress is not None and expected > 0:
+        start, end = PROGRESS_STAGES["request_sent"], PROGRESS_STAGES["results_received"]
+        on_progress("request_sent", start + (end - start) * min(received, expected) / expected)
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def dumps_json(content: Any) -> bytes:
+    """JSON request body, encoded with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content).encode("utf-8")
+
+
+def loads_json(body: Union[bytes, str]) -> Any:
+    """Parse JSON with orjson when it is installed"""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def decode_response(response: requests.Response) -> Any:
+    """
+    API response body decoded by its Content-Type (MessagePack or JSON)
+    
+    gzip (and, with brotli installed, br) bodies are already decompressed by requests.
+    
+    Raises:
+        ValueError: If the body is not valid in its format
+    """
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type in MSGPACK_TYPES and msgpack is not None:
+        return msgpack.unpackb(response.content)
+    return loads_json(response.content)
+
 @dataclass
 class RecipeRequest:
     """Data class for recipe request parameters"""
@@ -27,65 +101,264 @@ class RecipeRequest:
             "params": self.params
         }
 
+class HealthMonitor:
+    """
+    Shared, background-refreshed health state for one API with a circuit breaker
+    
+    A daemon thread probes the health URL every ``interval`` seconds, so callers
+    read the current state without a round trip. Failures open the circuit and
+    the API is skipped; after ``reset_timeout`` seconds one request is let
+    through (half-open) and its outcome, or the next successful background
+    probe, closes or re-opens the circuit.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    INTERVAL = float(os.environ.get("RECIPE_API_HEALTH_INTERVAL", 10))
+    RESET_TIMEOUT = float(os.environ.get("RECIPE_API_RESET_TIMEOUT", 15))
+    PROBE_TIMEOUT = 2
+    
+    _monitors: Dict[str, "HealthMonitor"] = {}
+    _monitors_lock = threading.Lock()
+    
+    def __init__(self, health_url: str, session: requests.Session,
+                 interval: float = INTERVAL, reset_timeout: float = RESET_TIMEOUT):
+        self.health_url = health_url
+        self.session = session
+        self.interval = interval
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.last_checked: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"health-{health_url}", daemon=True)
+        self._thread.start()
+    
+    @classmethod
+    def for_url(cls, health_url: str, session: requests.Session) -> "HealthMonitor":
+        """The process-wide monitor for ``health_url``, started on first use"""
+        with cls._monitors_lock:
+            monitor = cls._monitors.get(health_url)
+            if monitor is None:
+                monitor = cls._monitors[health_url] = cls(health_url, session)
+            return monitor
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+    
+    def stop(self) -> None:
+        self._stop.set()
+    
+    def probe(self) -> bool:
+        """Synchronously check the health URL and update the circuit"""
+        try:
+            healthy = self.session.get(self.health_url, timeout=self.PROBE_TIMEOUT).status_code == 200
+        except requests.exceptions.RequestException as e:
+            logger.info(f"API health check failed: {e}. Using fallback mode.")
+            healthy = False
+        self.last_checked = time.time()
+        if healthy:
+            self.record_success()
+        else:
+            self.record_failure()
+        return healthy
+    
+    @property
+    def available(self) -> bool:
+        """Current state without side effects (True unless the circuit is open)"""
+        return self.state != self.OPEN
+    
+    def allow_request(self) -> bool:
+        """Whether a request may go to the API now; may start a half-open trial"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._trial_in_flight = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state != self.OPEN:
+                self.opened_at = time.monotonic()
+            self.state = self.OPEN
+            self._trial_in_flight = False
+
 class RecipeAPI:
     """Handles communication with the recipe recommendation API with fallback"""
     
+    # Connection pool shared by every RecipeAPI (and so every Generator) in the process
+    POOL_SIZE = int(os.environ.get("RECIPE_API_POOL_SIZE", 10))
+    MAX_RETRIES = int(os.environ.get("RECIPE_API_RETRIES", 2))
+    # Response format asked of /predict: "json" (default) or "msgpack" (needs msgpack on both sides)
+    RESPONSE_FORMAT = os.environ.get("RECIPE_API_FORMAT", "json")
+    
+    _session: Optional[requests.Session] = None
+    _session_lock = threading.Lock()
+    
     def __init__(self, base_url: Optional[str] = None):
         # Use provided URL or try localhost, but always have fallback
         self.base_url = base_url or "http://127.0.0.1:8000"
         self.predict_url = f"{self.base_url}/predict"
+        self.stream_url = f"{self.base_url}/predict/stream"
         self.health_url = f"{self.base_url}/health"
         self.stats_url = f"{self.base_url}/stats"
         self.timeout = 10  # Reduced timeout for faster fallback
-        self.use_api = False  # Will be set based on health check
+        self.accept = "application/json"
+        if self.RESPONSE_FORMAT == "msgpack":
+            if msgpack is not None:
+                # A server without msgpack answers in JSON, which decode_response also reads
+                self.accept = "application/msgpack, application/json;q=0.9"
+            else:
+                logger.warning("RECIPE_API_FORMAT=msgpack but msgpack is not installed; using JSON")
+        self.session = self.get_session()
+        self.monitor = HealthMonitor.for_url(self.health_url, self.session)
+    
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """Process-wide keep-alive session with a bounded pool and retries"""
+        with cls._session_lock:
+            if cls._session is None:
+                retries = Retry(
+                    total=cls.MAX_RETRIES,
+                    connect=cls.MAX_RETRIES,
+                    read=0,
+                    status=cls.MAX_RETRIES,
+                    status_forcelist=(502, 504),
+                    allowed_methods=frozenset({"GET", "POST"}),
+                    backoff_factor=0.1,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=cls.POOL_SIZE,
+                    pool_maxsize=cls.POOL_SIZE,
+                    max_retries=retries
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._session = session
+            return cls._session
+    
+    @property
+    def use_api(self) -> bool:
+        return self.monitor.available
         
-    def check_health(self) -> bool:
-        """Check if the API server is healthy - with timeout"""
-        try:
-            # Try localhost first, but fail fast
-            response = requests.get(self.health_url, timeout=5)
-            if response.status_code == 200:
-                self.use_api = True
-                return True
-        except (requests.exceptions.ConnectionError, 
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException) as e:
-            logger.info(f"API health check failed: {e}. Using fallback mode.")
-            self.use_api = False
-            return False
-        return False
+    def check_health(self, force: bool = False) -> bool:
+        """Current API health from the shared monitor; ``force`` probes synchronously"""
+        if force:
+            return self.monitor.probe()
+        return self.monitor.available
     
     def predict(self, request_data: RecipeRequest) -> Dict[str, Any]:
         """
         Make prediction request to API with automatic fallback
         Returns dict instead of Response object for consistency
         """
-        if not self.use_api:
-            # Already know API is not available
+        if not self.monitor.allow_request():
+            # Circuit is open: skip the API until a probe or half-open trial succeeds
             raise ConnectionError("API server not available. Using fallback mode.")
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 url=self.predict_url,
-                json=request_data.to_dict(),
+                data=dumps_json(request_data.to_dict()),
                 timeout=self.timeout,
                 headers={
                     "Content-Type": "application/json",
-                    "Accept": "application/json"
+                    "Accept": self.accept
                 }
             )
             
             if response.status_code == 200:
-                return response.json()
+                self.monitor.record_success()
+                return decode_response(response)
             else:
+                if response.status_code >= 500:
+                    self.monitor.record_failure()
+                else:
+                    self.monitor.record_success()
                 raise ConnectionError(f"API returned status {response.status_code}")
                 
         except (requests.exceptions.ConnectionError,
                 requests.exceptions.Timeout,
-                requests.exceptions.RequestException) as e:
+                requests.exceptions.RequestException,
+                ValueError) as e:
+            logger.warning(f"API request failed: {e}")
+            self.monitor.record_failure()  # Open the circuit until the API recovers
+            raise ConnectionError(f"API connection failed: {e}")
+    
+    def predict_stream(self, request_data: RecipeRequest) -> Iterator[Dict[str, Any]]:
+        """
+        Stream recommendations from the API, yielding each recipe as it arrives
+        
+        Servers without the streaming endpoint are answered with a regular
+        ``predict`` call instead.
+        
+        Args:
+            request_data: Recipe request parameters
+            
+        Yields:
+            Dict[str, Any]: Recipes, best match first
+            
+        Raises:
+            ConnectionError: If the API is unavailable or the stream breaks off
+        """
+        if not self.monitor.allow_request():
+            raise ConnectionError("API server not available. Using fallback mode.")
+        
+        try:
+            response = self.session.post(
+                url=self.stream_url,
+                data=dumps_json(request_data.to_dict()),
+                timeout=self.timeout,
+                stream=True,
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "application/x-ndjson"
+                }
+            )
+        except requests.exceptions.RequestException as e:
             logger.warning(f"API request failed: {e}")
-            self.use_api = False  # Disable API for future requests
+            self.monitor.record_failure()
             raise ConnectionError(f"API connection failed: {e}")
+        
+        with response:
+            if response.status_code == 404:
+                self.monitor.record_success()
+                yield from self.predict(request_data).get("output", [])
+                return
+            if response.status_code != 200:
+                if response.status_code >= 500:
+                    self.monitor.record_failure()
+                else:
+                    self.monitor.record_success()
+                raise ConnectionError(f"API returned status {response.status_code}")
+            
+            self.monitor.record_success()
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        yield loads_json(line)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"API stream interrupted: {e}")
+                self.monitor.record_failure()
+                raise ConnectionError(f"API stream interrupted: {e}")
 
 class Generator:
     """
@@ -206,7 +479,8 @@ class Generator:
         nutrition_input: Optional[List[float]] = None,
         ingredients: Optional[List[str]] = None,
         params: Optional[Dict[str, Any]] = None,
-        api_url: Optional[str] = None
+        api_url: Optional[str] = None,
+        engine_mode: Optional[str] = None
     ):
         """
         Initialize the Generator
@@ -216,195 +490,48 @@ class Generator:
             ingredients: List of ingredient names
             params: Dictionary of parameters
             api_url: URL of the recommendation API (optional)
+            engine_mode: "api" or "embedded" (default: RECIPE_ENGINE_MODE)
         """
         self.nutrition_input = nutrition_input or []
         self.ingredients = ingredients or []
         self.params = {**self.DEFAULT_PARAMS, **(params or {})}
         
-        # Initialize API with automatic fallback detection
-        self.api = RecipeAPI(api_url)
+        # In-process engine (shared, memory-mapped); without it requests go to the API
+        self.engine = None
+        if (engine_mode or ENGINE_MODE) == "embedded":
+            try:
+                self.engine = load_engine()
+                logger.info("Using the embedded recommendation engine")
+            except (ImportError, OSError, ValueError) as e:
+                logger.error(f"Embedded engine unavailable, using the API: {e}")
         
-        # Try to connect to API, but don't fail if unavailable
-        try:
-            self.api_available = self.api.check_health()
-            if self.api_available:
-                logger.info("API server is available")
-            else:
-                logger.info("API server not available, using standalone mode")
-        except Exception as e:
-            logger.info(f"API check failed: {e}. Using standalone mode.")
-            self.api_available = False
+        # The API client (and its health monitor thread) is only needed without an engine
+        self.api = None
+        self.api_available = False
+        if self.engine is None:
+            self.api = RecipeAPI(api_url)
+            
+            # Read the shared health state (no network round trip), don't fail if unavailable
+            try:
+                self.api_available = self.api.check_health()
+                if self.api_available:
+                    logger.info("API server is available")
+                else:
+                    logger.info("API server not available, using standalone mode")
+            except Exception as e:
+                logger.info(f"API check failed: {e}. Using standalone mode.")
+                self.api_available = False
         
         self.last_response = None
         self.last_request_time = None
+        self.stream_source = None
         
-        # Initialize recipe database for standalone mode
-        self._init_recipe_database()
-    
-    def _init_recipe_database(self):
-        """Initialize recipe database for standalone mode"""
-        self.recipe_database = [
-            {
-                "Name": "Grilled Chicken Bowl",
-                "Calories": 450,
-                "PrepTime": 15,
-                "CookTime": 20,
-                "ProteinContent": 35,
-                "FatContent": 12,
-                "CarbohydrateContent": 40,
-                "FiberContent": 8,
-                "SugarContent": 5,
-                "SaturatedFatContent": 3,
-                "CholesterolContent": 85,
-                "SodiumContent": 350,
-                "RecipeIngredientParts": ["chicken breast", "brown rice", "broccoli", "carrot", "soy sauce"],
-                "RecipeInstructions": ["Grill chicken until cooked through", "Cook rice according to package", "Steam vegetables", "Combine all ingredients in bowl", "Add sauce and serve"]
-            },
-            {
-                "Name": "Vegetable Omelette",
-                "Calories": 320,
-                "PrepTime": 10,
-                "CookTime": 10,
-                "ProteinContent": 22,
-                "FatContent": 18,
-                "CarbohydrateContent": 15,
-                "FiberContent": 4,
-                "SugarContent": 3,
-                "SaturatedFatContent": 5,
-                "CholesterolContent": 370,
-                "SodiumContent": 420,
-                "RecipeIngredientParts": ["eggs", "bell pepper", "onion", "spinach", "cheese", "olive oil"],
-                "RecipeInstructions": ["Chop vegetables", "Beat eggs in bowl", "Sauté vegetables", "Pour eggs over vegetables", "Cook until set", "Add cheese and fold"]
-            },
-            {
-                "Name": "Rice & Broccoli",
-                "Calories": 380,
-                "PrepTime": 5,
-                "CookTime": 15,
-                "ProteinContent": 12,
-                "FatContent": 8,
-                "CarbohydrateContent": 65,
-                "FiberContent": 6,
-                "SugarContent": 2,
-                "SaturatedFatContent": 1,
-                "CholesterolContent": 0,
-                "SodiumContent": 280,
-                "RecipeIngredientParts": ["rice", "broccoli", "garlic", "soy sauce", "sesame oil"],
-                "RecipeInstructions": ["Cook rice", "Steam broccoli", "Sauté garlic", "Combine all ingredients", "Season with soy sauce and sesame oil"]
-            },
-            {
-                "Name": "Salmon with Asparagus",
-                "Calories": 420,
-                "PrepTime": 10,
-                "CookTime": 15,
-                "ProteinContent": 38,
-                "FatContent": 22,
-                "CarbohydrateContent": 18,
-                "FiberContent": 6,
-                "SugarContent": 4,
-                "SaturatedFatContent": 4,
-                "CholesterolContent": 95,
-                "SodiumContent": 320,
-                "RecipeIngredientParts": ["salmon", "asparagus", "lemon", "garlic", "olive oil", "dill"],
-                "RecipeInstructions": ["Season salmon", "Roast asparagus", "Pan-sear salmon", "Squeeze lemon", "Garnish with dill"]
-            },
-            {
-                "Name": "Veggie Stir Fry",
-                "Calories": 280,
-                "PrepTime": 15,
-                "CookTime": 10,
-                "ProteinContent": 14,
-                "FatContent": 10,
-                "CarbohydrateContent": 35,
-                "FiberContent": 9,
-                "SugarContent": 8,
-                "SaturatedFatContent": 1,
-                "CholesterolContent": 0,
-                "SodiumContent": 450,
-                "RecipeIngredientParts": ["tofu", "broccoli", "carrot", "bell pepper", "soy sauce", "ginger"],
-                "RecipeInstructions": ["Press tofu", "Chop vegetables", "Stir fry tofu", "Add vegetables", "Season with sauce"]
-            },
-            {
-                "Name": "Greek Yogurt Parfait",
-                "Calories": 250,
-                "PrepTime": 5,
-                "CookTime": 0,
-                "ProteinContent": 20,
-                "FatContent": 5,
-                "CarbohydrateContent": 32,
-                "FiberContent": 6,
-                "SugarContent": 18,
-                "SaturatedFatContent": 2,
-                "CholesterolContent": 15,
-                "SodiumContent": 120,
-                "RecipeIngredientParts": ["greek yogurt", "granola", "mixed berries", "honey", "chia seeds"],
-                "RecipeInstructions": ["Layer yogurt", "Add granola", "Top with berries", "Drizzle honey", "Sprinkle chia seeds"]
-            },
-            {
-                "Name": "Quinoa Salad",
-                "Calories": 320,
-                "PrepTime": 20,
-                "CookTime": 15,
-                "ProteinContent": 18,
-                "FatContent": 14,
-                "CarbohydrateContent": 38,
-                "FiberContent": 7,
-                "SugarContent": 5,
-                "SaturatedFatContent": 2,
-                "CholesterolContent": 0,
-                "SodiumContent": 280,
-                "RecipeIngredientParts": ["quinoa", "cucumber", "tomato", "red onion", "feta cheese", "olive oil"],
-                "RecipeInstructions": ["Cook quinoa", "Chop vegetables", "Mix ingredients", "Add dressing", "Chill before serving"]
-            },
-            {
-                "Name": "Beef and Broccoli",
-                "Calories": 380,
-                "PrepTime": 15,
-                "CookTime": 12,
-                "ProteinContent": 42,
-                "FatContent": 16,
-                "CarbohydrateContent": 22,
-                "FiberContent": 5,
-                "SugarContent": 6,
-                "SaturatedFatContent": 4,
-                "CholesterolContent": 105,
-                "SodiumContent": 520,
-                "RecipeIngredientParts": ["beef strips", "broccoli", "garlic", "ginger", "soy sauce", "sesame oil"],
-                "RecipeInstructions": ["Slice beef", "Blanch broccoli", "Stir fry beef", "Add broccoli", "Season with sauce"]
-            },
-            {
-                "Name": "Avocado Toast",
-                "Calories": 220,
-                "PrepTime": 5,
-                "CookTime": 3,
-                "ProteinContent": 8,
-                "FatContent": 12,
-                "CarbohydrateContent": 22,
-                "FiberContent": 7,
-                "SugarContent": 2,
-                "SaturatedFatContent": 2,
-                "CholesterolContent": 0,
-                "SodiumContent": 180,
-                "RecipeIngredientParts": ["whole wheat bread", "avocado", "lemon juice", "salt", "pepper", "red pepper flakes"],
-                "RecipeInstructions": ["Toast bread", "Mash avocado", "Add lemon juice", "Spread on toast", "Season to taste"]
-            },
-            {
-                "Name": "Tomato Basil Pasta",
-                "Calories": 420,
-                "PrepTime": 10,
-                "CookTime": 15,
-                "ProteinContent": 15,
-                "FatContent": 12,
-                "CarbohydrateContent": 68,
-                "FiberContent": 6,
-                "SugarContent": 8,
-                "SaturatedFatContent": 2,
-                "CholesterolContent": 0,
-                "SodiumContent": 320,
-                "RecipeIngredientParts": ["pasta", "tomato", "basil", "garlic", "olive oil", "parmesan"],
-                "RecipeInstructions": ["Cook pasta", "Chop tomatoes", "Sauté garlic", "Combine ingredients", "Garnish with basil"]
-            }
-        ]
+        # Shared read-only recipe database for standalone mode (loaded once per process)
+        try:
+            self.recipe_database = load_recipe_database()
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Fallback recipe database unavailable: {e}")
+            self.recipe_database = None
     
     def set_request(self, 
                    nutrition_input: List[float], 
@@ -422,6 +549,29 @@ class Generator:
         self.ingredients = ingredients
         self.params = {**self.DEFAULT_PARAMS, **params}
         
+    def for_request(self,
+                    nutrition_input: List[float],
+                    ingredients: List[str],
+                    params: Optional[Dict[str, Any]] = None) -> "Generator":
+        """
+        A Generator for one request sharing this one's API client and recipe database
+        
+        Lets a single long-lived Generator serve concurrent sessions: each
+        request gets its own copy of the request state.
+        
+        Args:
+            nutrition_input: Nutrition values
+            ingredients: List of ingredients
+            params: Algorithm parameters
+            
+        Returns:
+            Generator: Shallow copy with the request set
+        """
+        generator = copy.copy(self)
+        generator.set_request(list(nutrition_input), list(ingredients), params or {})
+        generator.last_response = None
+        return generator
+    
     def validate_nutrition_input(self) -> bool:
         """
         Validate nutrition input format
@@ -501,81 +651,118 @@ class Generator:
         """
         Generate recommendations using standalone logic (no API)
         
+        Recipes are scored in vectorized form: nutrition similarity over all
+        NUTRITION_CATEGORIES, averaged with the ingredient match rate when
+        ingredients are given; the top ``n_neighbors`` are returned with
+        their scores.
+        
         Returns:
             List[Dict[str, Any]]: Recipe recommendations
         """
-        n_neighbors = self.params.get("n_neighbors", 5)
+        if not self.recipe_database:
+            return []
+        n_neighbors = min(self.params.get("n_neighbors", 5), len(self.recipe_database))
+        if n_neighbors <= 0:
+            return []
         
-        # Filter recipes based on ingredients
         normalized_ingredients = self.normalize_ingredients(self.ingredients)
         
-        if normalized_ingredients:
-            # Score recipes based on ingredient matches
-            scored_recipes = []
-            for recipe in self.recipe_database:
-                recipe_ingredients = [ing.lower() for ing in recipe["RecipeIngredientParts"]]
-                
-                # Calculate match score
-                matches = sum(1 for ing in normalized_ingredients if any(ing in recipe_ing for recipe_ing in recipe_ingredients))
-                score = matches / len(normalized_ingredients) if normalized_ingredients else 0
-                
-                # Add nutrition similarity score (simplified)
-                if self.nutrition_input:
-                    cal_diff = abs(recipe.get("Calories", 0) - self.nutrition_input[0]) / max(self.nutrition_input[0], 1)
-                    nutrition_score = 1 / (1 + cal_diff)
-                    score = (score + nutrition_score) / 2
-                
-                scored_recipes.append((score, recipe))
-            
-            # Sort by score and take top N
-            scored_recipes.sort(key=lambda x: x[0], reverse=True)
-            recommendations = [recipe for _, recipe in scored_recipes[:n_neighbors]]
-            
-            # Add similarity scores
-            for i, recipe in enumerate(recommendations):
-                recipe["similarity_score"] = round(0.8 - (i * 0.1), 2)  # Decreasing similarity
-        
+        if self.nutrition_input:
+            scores = self.recipe_database.nutrition_scores(self.nutrition_input)
+            if normalized_ingredients:
+                scores = (scores + self.recipe_database.ingredient_scores(normalized_ingredients)) / 2
+        elif normalized_ingredients:
+            scores = self.recipe_database.ingredient_scores(normalized_ingredients)
         else:
-            # No ingredients specified, return random selection
-            recommendations = random.sample(self.recipe_database, min(n_neighbors, len(self.recipe_database)))
-            for i, recipe in enumerate(recommendations):
-                recipe["similarity_score"] = round(random.uniform(0.6, 0.9), 2)
+            scores = np.zeros(len(self.recipe_database))
         
-        return recommendations
-    
-    def generate(self) -> Dict[str, Any]:
-        """
-        Generate recipe recommendations with automatic fallback
+        # Top-k without sorting the whole database, then order the k best
+        top = np.argpartition(-scores, n_neighbors - 1)[:n_neighbors]
+        top = top[np.argsort(-scores[top], kind="stable")]
         
-        Returns:
-            Dict[str, Any]: Recipe recommendations response
-        """
+        return [
+            {**self.recipe_database[i], "similarity_score": round(float(scores[i]), 3)}
+            for i in top
+        ]
+    
+    def _build_request(self) -> RecipeRequest:
+        """Validated request for the current nutrition input and ingredients"""
         # Validate input
         if not self.validate_nutrition_input():
             # Use default nutrition values if invalid
             if not self.nutrition_input:
                 self.nutrition_input = [500] * len(self.NUTRITION_CATEGORIES)
         
-        # Normalize ingredients
-        normalized_ingredients = self.normalize_ingredients(self.ingredients)
-        
-        # Prepare request data
-        request_data = RecipeRequest(
+        self.last_request_time = time.time()
+        return RecipeRequest(
             nutrition_input=self.nutrition_input,
-            ingredients=normalized_ingredients,
+            ingredients=self.normalize_ingredients(self.ingredients),
             params=self.params
         )
+    
+    def _generate_embedded_recommendations(self, request_data: RecipeRequest) -> List[Dict[str, Any]]:
+        """
+        Top-k search on the in-process engine, the same as the API's /predict
         
-        self.last_request_time = time.time()
+        Args:
+            request_data: Validated request
+            
+        Returns:
+            List[Dict[str, Any]]: Recipe recommendations
         
-        # Try API if available
-        if self.api_available:
+        Raises:
+            re.error: If an ingredient is not a valid pattern (the API answers 422)
+        """
+        params = {"n_neighbors": request_data.params.get("n_neighbors", 5), "return_distance": False}
+        return self.engine.recommend(request_data.nutrition_input, request_data.ingredients, params) or []
+    
+    def generate(self, on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Generate recipe recommendations with automatic fallback
+        
+        Args:
+            on_progress: Called with each completed stage of PROGRESS_STAGES
+                and its fraction of the work
+        
+        Returns:
+            Dict[str, Any]: Recipe recommendations response
+        """
+        request_data = self._build_request()
+        normalized_ingredients = request_data.ingredients
+        
+        if self.engine is not None:
+            report_progress(on_progress, "health")
+            report_progress(on_progress, "request_sent")
+            try:
+                recommendations = self._generate_embedded_recommendations(request_data)
+                report_progress(on_progress, "results_received")
+                return {
+                    "success": True,
+                    "output": recommendations,
+                    "metadata": {
+                        "source": "embedded",
+                        "api_available": self.api_available,
+                        "ingredients_used": normalized_ingredients,
+                        "nutrition_input": self.nutrition_input
+                    }
+                }
+            except re.error as e:
+                logger.warning(f"Embedded engine rejected the ingredients: {e}")
+                # Fall through to standalone mode, as the API path does on a 422
+        else:
+            self.api_available = self.api.check_health()
+            report_progress(on_progress, "health")
+        
+        # Try API; the shared circuit breaker rejects the call at once while it is open
+        if self.api is not None:
             try:
                 logger.info("Attempting API request...")
+                report_progress(on_progress, "request_sent")
                 response = self.api.predict(request_data)
+                report_progress(on_progress, "results_received")
                 self.last_response = response
                 self.api_available = True  # API worked, keep it enabled
-                
+            
                 return {
                     "success": True,
                     "output": response.get("output", []),
@@ -586,15 +773,16 @@ class Generator:
                         "nutrition_input": self.nutrition_input
                     }
                 }
-                
+            
             except ConnectionError as e:
                 logger.warning(f"API request failed: {e}")
-                self.api_available = False  # Disable API for next time
+                self.api_available = False
                 # Fall through to standalone mode
         
         # Use standalone mode (fallback)
         logger.info("Using standalone recommendation mode")
         recommendations = self._generate_standalone_recommendations()
+        report_progress(on_progress, "results_received")
         
         return {
             "success": True,
@@ -608,6 +796,68 @@ class Generator:
             }
         }
     
+    def generate_stream(self, on_progress: Optional[ProgressCallback] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield recipe recommendations one at a time, best match first
+        
+        Recipes come from the API's streaming endpoint as soon as each one
+        arrives; if the API cannot be reached before the first recipe, the
+        standalone recommendations are yielded instead. An embedded engine
+        answers in-process. Once the stream is exhausted, ``stream_source``
+        says where the recipes came from ("api", "embedded" or "standalone"),
+        or is None if the API stream broke off part way.
+        
+        Args:
+            on_progress: Called with the stages of PROGRESS_STAGES up to
+                "results_received", and once more for every recipe received
+        
+        Yields:
+            Dict[str, Any]: Recipe recommendations
+        """
+        self.stream_source = None
+        request_data = self._build_request()
+        expected = request_data.params.get("n_neighbors", 5)
+        if self.engine is not None:
+            report_progress(on_progress, "health")
+            report_progress(on_progress, "request_sent")
+            try:
+                recommendations = self._generate_embedded_recommendations(request_data)
+            except re.error as e:
+                logger.warning(f"Embedded engine rejected the ingredients: {e}")
+            else:
+                for received, recipe in enumerate(recommendations, 1):
+                    report_stream_progress(on_progress, received, expected)
+                    yield recipe
+                report_progress(on_progress, "results_received")
+                self.stream_source = "embedded"
+                return
+        else:
+            self.api_available = self.api.check_health()
+            report_progress(on_progress, "health")
+            report_progress(on_progress, "request_sent")
+        received = 0
+        if self.api is not None:
+            try:
+                for recipe in self.api.predict_stream(request_data):
+                    received += 1
+                    report_stream_progress(on_progress, received, expected)
+                    yield recipe
+                self.api_available = True
+                report_progress(on_progress, "results_received")
+                self.stream_source = "api"
+                return
+            except ConnectionError as e:
+                logger.warning(f"API stream failed: {e}")
+                self.api_available = False
+                if received:
+                    report_progress(on_progress, "results_received")
+                    return  # Recipes already shown stay; don't mix in fallback results
+        
+        logger.info("Using standalone recommendation mode")
+        yield from self._generate_standalone_recommendations()
+        report_progress(on_progress, "results_received")
+        self.stream_source = "standalone"
+    
     def get_response_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the last response
@@ -618,7 +868,7 @@ class Generator:
         stats = {
             "api_available": self.api_available,
             "last_request_time": self.last_request_time,
-            "mode": "api" if self.api_available else "standalone"
+            "mode": "embedded" if self.engine is not None else "api" if self.api_available else "standalone"
         }
         
         return stats
@@ -630,11 +880,11 @@ class Generator:
             Dict[str, Any]: Connection test results
         """
         results = {
-            "api_url": self.api.base_url,
+            "api_url": self.api.base_url if self.api is not None else None,
             "api_available": self.api_available,
             "standalone_mode": not self.api_available,
             "timestamp": time.time(),
-            "recipe_database_size": len(self.recipe_database)
+            "recipe_database_size": len(self.recipe_database) if self.recipe_database else 0
         }
         
         return results
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Shared by every Streamlit session and process on the machine
+DEFAULT_PATH = os.environ.get(
+    "IMAGE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_cache.sqlite3")
+)
+MAX_ENTRIES = 20000
+TTL = 30 * 24 * 3600          # found links are kept for 30 days
+NEGATIVE_TTL = 24 * 3600      # misses are retried after a day
+
+
+def normalize_name(name):
+    """Cache key for a recipe name: lowercase with collapsed whitespace"""
+    return " ".join(str(name).lower().split())
+
+
+class ImageCache:
+    """
+    On-disk LRU cache of recipe image links backed by SQLite
+
+    A lookup returns ``(hit, link)``; ``hit`` with ``link is None`` is a
+    remembered miss (negative entry). Entries expire after ``ttl`` seconds
+    (``negative_ttl`` for misses) and the least recently used ones are evicted
+    once the table holds more than ``max_entries`` rows.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=MAX_ENTRIES, ttl=TTL, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                " key TEXT PRIMARY KEY,"
+                " link TEXT,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS images_accessed ON images (accessed_at)")
+
+    def get(self, name):
+        key = normalize_name(name)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT link, expires_at FROM images WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return False, None
+            with self._conn:
+                self._conn.execute("UPDATE images SET accessed_at = ? WHERE key = ?", (now, key))
+            if row[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, row[0]
+
+    def put(self, name, link):
+        """Store a found link, or a miss when ``link`` is None"""
+        now = time.time()
+        ttl = self.ttl if link is not None else self.negative_ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (key, link, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (normalize_name(name), link, now + ttl, now)
+            )
+            self._conn.execute(
+                "DELETE FROM images WHERE key IN ("
+                " SELECT key FROM images ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,133 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Built from the real dataset by FastAPI_Backend/fallback_db.py
+DEFAULT_PATH = os.environ.get(
+    "FALLBACK_RECIPES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fallback_recipes.npz")
+)
+
+_databases: Dict[str, "RecipeDatabase"] = {}
+_lock = threading.Lock()
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class PackedStrings:
+    """Strings packed into one UTF-8 buffer, string ``i`` being ``data[offsets[i]:offsets[i+1]]``"""
+
+    def __init__(self, bundle, key: str):
+        self.data = _read_only(bundle[key + ".data"])
+        self.offsets = _read_only(bundle[key + ".offsets"])
+        nulls_key = key + ".nulls"
+        self.nulls = _read_only(bundle[nulls_key]) if nulls_key in bundle.files else None
+        rows_key = key + ".rows"
+        self.rows = _read_only(bundle[rows_key]) if rows_key in bundle.files else None
+
+    def __len__(self) -> int:
+        return self.offsets.shape[0] - 1
+
+    def string(self, i: int) -> Optional[str]:
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def row(self, i: int) -> List[str]:
+        """Strings of list row ``i`` (for columns stored with row offsets)"""
+        return [self.string(j) for j in range(self.rows[i], self.rows[i + 1])]
+
+
+class RecipeDatabase:
+    """
+    Read-only recipe subset used when the API is unavailable
+
+    Loaded once per process from the bundled ``.npz`` file; the arrays the
+    standalone scorer needs (standardized nutrition matrix, ingredient
+    vocabulary and per-recipe ingredient ids) are derived at load time and
+    shared by every Generator. Recipes are materialized as dicts only when
+    indexed.
+    """
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as bundle:
+            self.nutrition_columns = [str(name) for name in bundle["nutrition_columns"]]
+            self.nutrition = _read_only(bundle["nutrition"].astype(np.float64))
+            self.times = {name: _read_only(bundle[name]) for name in ("PrepTime", "CookTime", "TotalTime")}
+            self.names = PackedStrings(bundle, "Name")
+            self.ingredients = PackedStrings(bundle, "RecipeIngredientParts")
+            self.instructions = PackedStrings(bundle, "RecipeInstructions")
+            self.image_links = PackedStrings(bundle, "image_link") if "image_link.data" in bundle.files else None
+
+        mean = self.nutrition.mean(axis=0) if len(self) else np.zeros(self.nutrition.shape[1])
+        std = self.nutrition.std(axis=0) if len(self) else np.ones(self.nutrition.shape[1])
+        self.nutrition_mean = _read_only(mean)
+        self.nutrition_std = _read_only(np.where(std > 0, std, 1.0))
+        self.standardized = _read_only((self.nutrition - self.nutrition_mean) / self.nutrition_std)
+        self.row_norms = _read_only(np.linalg.norm(self.standardized, axis=1))
+
+        # One entry per (recipe, ingredient) pair, pointing into a lowercased vocabulary
+        vocabulary: Dict[str, int] = {}
+        ids = [
+            vocabulary.setdefault(self.ingredients.string(j).lower(), len(vocabulary))
+            for j in range(len(self.ingredients))
+        ]
+        self.vocabulary = _read_only(np.array(list(vocabulary), dtype=str))
+        self.ingredient_ids = _read_only(np.array(ids, dtype=np.int64))
+        self.ingredient_rows = _read_only(np.repeat(np.arange(len(self)), np.diff(self.ingredients.rows)))
+
+    def __len__(self) -> int:
+        return self.nutrition.shape[0]
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        """A fresh recipe dict for row ``i``"""
+        recipe = {"Name": self.names.string(i)}
+        for name, values in self.times.items():
+            recipe[name] = int(values[i])
+        recipe.update({name: round(float(self.nutrition[i, k]), 2) for k, name in enumerate(self.nutrition_columns)})
+        recipe["RecipeIngredientParts"] = self.ingredients.row(i)
+        recipe["RecipeInstructions"] = self.instructions.row(i)
+        if self.image_links is not None:
+            recipe["image_link"] = self.image_links.string(i)
+        return recipe
+
+    def nutrition_scores(self, nutrition_input: List[float]) -> np.ndarray:
+        """Cosine similarity of every recipe to the standardized input, mapped to [0, 1]"""
+        query = (np.asarray(nutrition_input, dtype=np.float64) - self.nutrition_mean) / self.nutrition_std
+        norms = self.row_norms * np.linalg.norm(query)
+        cosine = self.standardized @ query / np.where(norms > 0, norms, 1.0)
+        return (cosine + 1) / 2
+
+    def ingredient_scores(self, ingredients: List[str]) -> np.ndarray:
+        """Fraction of the requested ingredients each recipe contains (substring match)"""
+        matched = np.zeros(len(self))
+        for ingredient in ingredients:
+            # Vocabulary entries containing the term, then the recipes using any of them
+            in_vocabulary = np.char.find(self.vocabulary, ingredient) >= 0
+            hits = np.bincount(self.ingredient_rows, weights=in_vocabulary[self.ingredient_ids], minlength=len(self))
+            matched += hits > 0
+        return matched / len(ingredients)
+
+
+def load_recipe_database(path: str = DEFAULT_PATH) -> RecipeDatabase:
+    """
+    The shared RecipeDatabase for ``path``, loaded on first use
+
+    Args:
+        path: Bundled ``.npz`` file
+
+    Returns:
+        RecipeDatabase: Instance shared by the whole process
+    """
+    database = _databases.get(path)
+    if database is None:
+        with _lock:
+            database = _databases.get(path)
+            if database is None:
+                database = _databases[path] = RecipeDatabase(path)
+    return database
@@ -0,0 +1,188 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import streamlit as st
+
+from Generate_Recommendations import Generator, ProgressCallback, report_progress, report_stream_progress
+
+# API and embedded-engine result sets are reused for identical inputs within this many seconds
+RESULT_TTL = int(os.environ.get("RECOMMENDATION_CACHE_TTL", 600))
+RESULT_MAX_ENTRIES = int(os.environ.get("RECOMMENDATION_CACHE_ENTRIES", 256))
+
+
+@st.cache_resource
+def get_generator() -> Generator:
+    """Process-wide Generator (with the standalone recipe database and any embedded engine); requests use ``for_request`` views of it"""
+    return Generator()
+
+
+@st.cache_resource
+def get_ingredient_categories(food_categories: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Lookups derived from a page's FOOD_CATEGORIES, built once per process
+
+    Args:
+        food_categories: Category name -> ingredient names
+
+    Returns:
+        Dict[str, Any]: ``all`` (every ingredient, in category order) and
+        ``category_of`` (ingredient -> its first category)
+    """
+    category_of: Dict[str, str] = {}
+    for category, ingredients in food_categories.items():
+        for ingredient in ingredients:
+            category_of.setdefault(ingredient, category)
+    return {
+        "all": [ingredient for ingredients in food_categories.values() for ingredient in ingredients],
+        "category_of": category_of
+    }
+
+
+def _query_key(
+    nutrition_input: List[float],
+    ingredients: List[str],
+    params: Dict[str, Any]
+) -> Tuple[Tuple[float, ...], Tuple[str, ...], Tuple[Tuple[str, Any], ...]]:
+    """Hashable form of a query; ingredient order, case and duplicates don't matter"""
+    return (
+        tuple(float(value) for value in nutrition_input),
+        tuple(sorted(get_generator().normalize_ingredients(ingredients))),
+        tuple(sorted(params.items()))
+    )
+
+
+class _Uncached(Exception):
+    """Carries a result out of the memoized function without caching it"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__("uncached result")
+        self.result = result
+
+
+# Pure data: no st.* calls (or callbacks making them), which a cache hit would replay
+@st.cache_data(ttl=RESULT_TTL, max_entries=RESULT_MAX_ENTRIES, show_spinner=False)
+def _engine_recommendations(
+    nutrition_input: Tuple[float, ...],
+    ingredients: Tuple[str, ...],
+    params: Tuple[Tuple[str, Any], ...]
+) -> Dict[str, Any]:
+    generator = get_generator().for_request(list(nutrition_input), list(ingredients), dict(params))
+    result = generator.generate()
+    if result["metadata"]["source"] == "standalone":
+        # Fallback results are cheap and should not outlive an API outage
+        raise _Uncached(result)
+    return result
+
+
+def get_recommendations(
+    nutrition_input: List[float],
+    ingredients: List[str],
+    params: Dict[str, Any],
+    on_progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    ``Generator.generate`` for these inputs, memoized for RESULT_TTL seconds
+
+    Progress is reported around the (possibly cached) call: "health" and
+    "request_sent" before it, "results_received" after. A cache hit returns
+    a copy of the stored result. Standalone (fallback) results are never
+    stored.
+
+    Args:
+        nutrition_input: Nutrition values
+        ingredients: List of ingredients
+        params: Algorithm parameters
+        on_progress: Progress callback, see ``Generator.generate``
+
+    Returns:
+        Dict[str, Any]: Recipe recommendations response
+    """
+    report_progress(on_progress, "health")
+    report_progress(on_progress, "request_sent")
+    try:
+        result = _engine_recommendations(*_query_key(nutrition_input, ingredients, params))
+    except _Uncached as e:
+        result = e.result
+    report_progress(on_progress, "results_received")
+    return result
+
+
+class _StreamResults:
+    """Recipes of completed streams by query key, bounded and expiring like the st.cache_data results"""
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any) -> Optional[List[Dict[str, Any]]]:
+        """Copies of the stored recipes, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[1])
+    
+    def put(self, key: Any, recipes: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, recipes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def _stream_results() -> _StreamResults:
+    return _StreamResults(RESULT_TTL, RESULT_MAX_ENTRIES)
+
+
+def stream_recommendations(
+    nutrition_input: List[float],
+    ingredients: List[str],
+    params: Dict[str, Any],
+    on_progress: Optional[ProgressCallback] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    ``Generator.generate_stream`` for these inputs on the shared Generator
+
+    Recipes are yielded as they arrive, best first, so a page can draw the
+    first card before the rest are ranked and sent. Complete API and
+    embedded-engine streams are kept for RESULT_TTL seconds; repeating the
+    query replays copies of their recipes without a request.
+
+    Args:
+        nutrition_input: Nutrition values
+        ingredients: List of ingredients
+        params: Algorithm parameters
+        on_progress: Called with the stages of PROGRESS_STAGES up to
+            "results_received" and for every recipe, replayed or not
+
+    Yields:
+        Dict[str, Any]: Recipe recommendations
+    """
+    key = _query_key(nutrition_input, ingredients, params)
+    results = _stream_results()
+    recipes = results.get(key)
+    if recipes is not None:
+        report_progress(on_progress, "health")
+        report_progress(on_progress, "request_sent")
+        for received, recipe in enumerate(recipes, 1):
+            report_stream_progress(on_progress, received, len(recipes))
+            yield recipe
+        report_progress(on_progress, "results_received")
+        return
+    
+    generator = get_generator().for_request(nutrition_input, ingredients, params)
+    recipes = []
+    for recipe in generator.generate_stream(on_progress):
+        recipes.append(copy.deepcopy(recipe))
+        yield recipe
+    if generator.stream_source in ("api", "embedded"):
+        results.put(key, recipes)
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import time
 import requests
-from Generate_Recommendations import Generator
-from ImageFinder.ImageFinder import get_images_links as find_image
+from Generate_Recommendations import report_progress
+from Shared_Resources import get_ingredient_categories, stream_recommendations
+from ImageFinder.ImageFinder import get_images_links_concurrently as find_images
 from streamlit_echarts import st_echarts
 
 # ------------------ CONFIG ------------------
@@ -616,9 +616,8 @@ FOOD_CATEGORIES = {
     "🍋 Fruits": ["lemon", "lime", "orange", "apple", "banana", "berries"]
 }
 
-COMMON_INGREDIENTS = []
-for category in FOOD_CATEGORIES.values():
-    COMMON_INGREDIENTS.extend(category)
+INGREDIENT_LOOKUP = get_ingredient_categories(FOOD_CATEGORIES)
+COMMON_INGREDIENTS = INGREDIENT_LOOKUP["all"]
 
 # Fallback images for food categories with more variety
 FOOD_CATEGORY_IMAGES = {
@@ -671,69 +670,54 @@ if "animation_played" not in st.session_state:
     st.session_state.animation_played = False
 
 # ------------------ RECOMMENDATION LOGIC ------------------
+# Status shown once each Generator progress stage has completed
+PROGRESS_MESSAGES = {
+    "health": "🧠 Processing ingredient preferences...",
+    "request_sent": "⚡ Searching through thousands of recipes...",
+    "results_received": "🖼️ Fetching beautiful food images...",
+    "images_resolved": "✨ Finalizing AI recommendations...",
+}
+
 class Recommendation:
     def __init__(self, nutrition_list, nb_recommendations, ingredients_list):
         self.nutrition_list = nutrition_list
         self.nb_recommendations = nb_recommendations
         self.ingredients_list = ingredients_list
 
-    def generate(self):
-        params = {
+    def _params(self):
+        return {
             "n_neighbors": self.nb_recommendations,
             "return_distance": False,
         }
 
-        try:
-            generator = Generator(self.nutrition_list, self.ingredients_list, params)
-            recipes = generator.generate()
-            
-            # Check if recipes is a list/dict or if it needs JSON parsing
-            if recipes is None:
-                st.error("No recipes generated. Please check your input parameters.")
-                return None
-                
-            # If recipes is a response object with json() method
-            if hasattr(recipes, 'json'):
-                recipes = recipes.json()
-            
-            # If recipes is a dict with 'output' key
-            if isinstance(recipes, dict):
-                recipes = recipes.get("output", [])
-            
-            # Ensure we have a list
-            if not isinstance(recipes, list):
-                st.error(f"Unexpected response format: {type(recipes)}")
-                return None
-
-            # Add images with loading animation and fallback
-            for recipe in recipes:
-                recipe_name = recipe.get("Name", "")
-                try:
-                    # Try to get image from ImageFinder
-                    image_link = find_image(recipe_name)
-                    if not image_link or image_link == "":
-                        # Try to get fallback image based on ingredients
-                        for ingredient in FOOD_CATEGORY_IMAGES:
-                            if ingredient.lower() in recipe_name.lower():
-                                image_link = FOOD_CATEGORY_IMAGES[ingredient]
-                                break
-                        else:
-                            # Default fallback image
-                            image_link = "https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=400&h=300&fit=crop&auto=format"
-                    
-                    recipe["image_link"] = image_link
-                except Exception as e:
-                    st.warning(f"Could not load image for {recipe_name}: {str(e)}")
-                    recipe["image_link"] = "https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=400&h=300&fit=crop&auto=format"
-                
-                # Simulate some processing delay for animation
-                time.sleep(0.01)
+    def stream(self, on_progress=None):
+        """Recipes one at a time as the backend sends them, best first, without resolved images"""
+        return stream_recommendations(self.nutrition_list, self.ingredients_list, self._params(), on_progress)
 
-            return recipes
-            
+    def attach_images(self, recipes):
+        """Give every recipe an image_link: prebuilt, looked up, or a fallback picture"""
+        # Recipes from a backend with a prebuilt image manifest already carry
+        # their link; resolve the rest concurrently, then fall back per recipe
+        try:
+            image_links = find_images([recipe.get("Name", "") for recipe in recipes if not recipe.get("image_link")])
         except Exception as e:
-            st.error(f"Error generating recommendations: {str(e)}")
-            return None
+            st.warning(f"Could not load recipe images: {str(e)}")
+            image_links = {}
+
+        for recipe in recipes:
+            recipe_name = recipe.get("Name", "")
+            image_link = recipe.get("image_link") or image_links.get(recipe_name)
+            if not image_link:
+                # Try to get fallback image based on ingredients
+                for ingredient in FOOD_CATEGORY_IMAGES:
+                    if ingredient.lower() in recipe_name.lower():
+                        image_link = FOOD_CATEGORY_IMAGES[ingredient]
+                        break
+                else:
+                    # Default fallback image
+                    image_link = "https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=400&h=300&fit=crop&auto=format"
+            recipe["image_link"] = image_link
+        return recipes
 
 # ------------------ ENHANCED DISPLAY LOGIC ------------------
 class Display:
@@ -1275,7 +1259,7 @@ def ingredients_selector():
         
         # Display uncategorized ingredients
         uncategorized = [ing for ing in st.session_state.selected_ingredients 
-                        if not any(ing in ingredients for ingredients in FOOD_CATEGORIES.values())]
+                        if ing not in INGREDIENT_LOOKUP["category_of"]]
         
         for category, ingredients in selected_by_category.items():
             st.markdown(f"**{category}:**")
@@ -1558,24 +1542,14 @@ if generate:
                 </div>
                 """, unsafe_allow_html=True)
         
-        # Add progressive loading with stages
+        # Progress advances as each stage of the real work completes
         progress_bar = st.progress(0)
         status_text = st.empty()
+        status_text.text("🔍 Analyzing your nutritional goals...")
         
-        loading_stages = [
-            "🔍 Analyzing your nutritional goals...",
-            "🧠 Processing ingredient preferences...",
-            "⚡ Searching through thousands of recipes...",
-            "🎯 Finding perfect matches...",
-            "🖼️ Fetching beautiful food images...",
-            "✨ Finalizing AI recommendations..."
-        ]
-        
-        for i, stage in enumerate(loading_stages):
-            progress = int((i + 1) * (100 / len(loading_stages)))
-            progress_bar.progress(progress)
-            status_text.text(stage)
-            time.sleep(0.3)
+        def show_progress(stage, fraction):
+            progress_bar.progress(int(fraction * 100))
+            status_text.text(PROGRESS_MESSAGES[stage])
         
         try:
             recommender = Recommendation(
@@ -1583,25 +1557,27 @@ if generate:
                 nb_recommendations,
                 st.session_state.selected_ingredients,
             )
-            st.session_state.recommendations = recommender.generate()
+            # Each card is drawn as soon as its recipe arrives; images are resolved once all are in
+            streamed_cards = st.columns(3)
+            recipes = []
+            for recipe in recommender.stream(show_progress):
+                if not recipes:
+                    placeholder.empty()
+                with streamed_cards[len(recipes) % 3]:
+                    display._display_recipe_card(recipe, len(recipes))
+                recipes.append(recipe)
+            if recipes:
+                recommender.attach_images(recipes)
+            report_progress(show_progress, "images_resolved")
+            st.session_state.recommendations = recipes or None
             st.session_state.generated = True
             
             # Clear loading animation
             placeholder.empty()
             progress_bar.empty()
             status_text.empty()
-            
-            # Show success effects
-            st.balloons()
-            st.markdown("""
-            <div style="text-align: center;">
-                <div style="font-size: 40px; animation: bounce 2s infinite;">✨</div>
-                <h3 style="color: #06D6A0;">AI Recommendations Ready!</h3>
-                <p>Perfect recipes found based on your preferences</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            time.sleep(1.5)
+            # Success effects are shown with the results after the rerun
+            st.session_state.celebrate = True
             
             # Rerun to show results
             st.rerun()
@@ -1610,6 +1586,15 @@ if generate:
             st.session_state.generated = False
 
 if st.session_state.generated and st.session_state.recommendations:
+    if st.session_state.pop("celebrate", False):
+        st.balloons()
+        st.markdown("""
+        <div style="text-align: center;">
+            <div style="font-size: 40px; animation: bounce 2s infinite;">✨</div>
+            <h3 style="color: #06D6A0;">AI Recommendations Ready!</h3>
+            <p>Perfect recipes found based on your preferences</p>
+        </div>
+        """, unsafe_allow_html=True)
     display.display_recommendation(st.session_state.recommendations)
     display.display_overview(st.session_state.recommendations)
     
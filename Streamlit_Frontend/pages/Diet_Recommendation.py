@@ -4,9 +4,9 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 import streamlit as st
 import pandas as pd
 import numpy as np
-import time
-from Generate_Recommendations import Generator
-from ImageFinder.ImageFinder import get_images_links as find_image
+from Generate_Recommendations import report_progress
+from Shared_Resources import get_ingredient_categories, get_recommendations
+from ImageFinder.ImageFinder import get_images_links_concurrently as find_images
 from streamlit_echarts import st_echarts
 
 
@@ -517,9 +517,8 @@ FOOD_CATEGORIES = {
     "🍋 Fruits": ["lemon", "lime", "orange", "apple", "banana", "berries"]
 }
 
-COMMON_INGREDIENTS = []
-for category in FOOD_CATEGORIES.values():
-    COMMON_INGREDIENTS.extend(category)
+INGREDIENT_LOOKUP = get_ingredient_categories(FOOD_CATEGORIES)
+COMMON_INGREDIENTS = INGREDIENT_LOOKUP["all"]
 
 # Fallback images for food categories
 FOOD_CATEGORY_IMAGES = {
@@ -565,21 +564,28 @@ if "food_images_cache" not in st.session_state:
     st.session_state.food_images_cache = {}
 
 # ------------------ RECOMMENDATION LOGIC ------------------
+# Status shown once each Generator progress stage has completed
+PROGRESS_MESSAGES = {
+    "health": "🧠 Processing ingredient preferences...",
+    "request_sent": "⚡ Searching recipe database...",
+    "results_received": "✨ Fetching recipe images...",
+    "images_resolved": "✅ AI recommendations ready!",
+}
+
 class Recommendation:
     def __init__(self, nutrition_list, nb_recommendations, ingredients_list):
         self.nutrition_list = nutrition_list
         self.nb_recommendations = nb_recommendations
         self.ingredients_list = ingredients_list
 
-    def generate(self):
+    def generate(self, on_progress=None):
         params = {
             "n_neighbors": self.nb_recommendations,
             "return_distance": False,
         }
 
         try:
-            generator = Generator(self.nutrition_list, self.ingredients_list, params)
-            recipes = generator.generate()
+            recipes = get_recommendations(self.nutrition_list, self.ingredients_list, params, on_progress)
             
             # Check if recipes is a list/dict or if it needs JSON parsing
             if recipes is None:
@@ -599,29 +605,28 @@ class Recommendation:
                 st.error(f"Unexpected response format: {type(recipes)}")
                 return None
 
-            # Add images with loading animation and fallback
+            # Recipes from a backend with a prebuilt image manifest already carry
+            # their link; resolve the rest concurrently, then fall back per recipe
+            try:
+                image_links = find_images([recipe.get("Name", "") for recipe in recipes if not recipe.get("image_link")])
+            except Exception as e:
+                st.warning(f"Could not load recipe images: {str(e)}")
+                image_links = {}
+
             for recipe in recipes:
                 recipe_name = recipe.get("Name", "")
-                try:
-                    # Try to get image from ImageFinder
-                    image_link = find_image(recipe_name)
-                    if not image_link or image_link == "":
-                        # Try to get fallback image based on ingredients
-                        for ingredient, image_url in FOOD_CATEGORY_IMAGES.items():
-                            if ingredient.lower() in recipe_name.lower():
-                                image_link = image_url
-                                break
-                        else:
-                            # Default fallback image
-                            image_link = "https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=400&h=300&fit=crop"
-                    
-                    recipe["image_link"] = image_link
-                except Exception as e:
-                    st.warning(f"Could not load image for {recipe_name}: {str(e)}")
-                    recipe["image_link"] = "https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=400&h=300&fit=crop"
-                
-                # Simulate some processing delay for animation
-                time.sleep(0.01)
+                image_link = recipe.get("image_link") or image_links.get(recipe_name)
+                if not image_link:
+                    # Try to get fallback image based on ingredients
+                    for ingredient, image_url in FOOD_CATEGORY_IMAGES.items():
+                        if ingredient.lower() in recipe_name.lower():
+                            image_link = image_url
+                            break
+                    else:
+                        # Default fallback image
+                        image_link = "https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=400&h=300&fit=crop"
+                recipe["image_link"] = image_link
+            report_progress(on_progress, "images_resolved")
 
             return recipes
             
@@ -1285,7 +1290,7 @@ def ingredients_selector():
         
         # Display uncategorized ingredients
         uncategorized = [ing for ing in st.session_state.selected_ingredients 
-                        if not any(ing in ingredients for ingredients in FOOD_CATEGORIES.values())]
+                        if ing not in INGREDIENT_LOOKUP["category_of"]]
         
         for category, ingredients in selected_by_category.items():
             st.markdown(f"**{category}:**")
@@ -1881,23 +1886,14 @@ if page == "📊 Generate Recipes":
     # Handle form submission
     if generate:
         with st.spinner("🤖 AI is analyzing your preferences and finding perfect recipes..."):
-            # Show advanced loading animation
+            # Progress advances as each stage of the real work completes
             progress_bar = st.progress(0)
             status_text = st.empty()
+            status_text.text("🔍 Analyzing nutrition goals...")
             
-            for i in range(100):
-                progress_bar.progress(i + 1)
-                if i < 25:
-                    status_text.text("🔍 Analyzing nutrition goals...")
-                elif i < 50:
-                    status_text.text("🧠 Processing ingredient preferences...")
-                elif i < 75:
-                    status_text.text("⚡ Searching recipe database...")
-                else:
-                    status_text.text("✨ Optimizing AI recommendations...")
-                time.sleep(0.02)
-            
-            status_text.text("✅ AI recommendations ready!")
+            def show_progress(stage, fraction):
+                progress_bar.progress(int(fraction * 100))
+                status_text.text(PROGRESS_MESSAGES[stage])
             
             try:
                 recommender = Recommendation(
@@ -1905,13 +1901,10 @@ if page == "📊 Generate Recipes":
                     nb_recommendations,
                     st.session_state.selected_ingredients,
                 )
-                st.session_state.recommendations = recommender.generate()
+                st.session_state.recommendations = recommender.generate(show_progress)
                 st.session_state.generated = True
-                
-                # Show success effects
-                st.balloons()
-                st.success("✨ AI has found perfect recipes for you!")
-                time.sleep(1)
+                # Success effects are shown with the results after the rerun
+                st.session_state.celebrate = True
                 
                 # Rerun to show results
                 st.rerun()
@@ -1921,6 +1914,9 @@ if page == "📊 Generate Recipes":
     
     # Display recommendations if generated
     if st.session_state.generated and st.session_state.recommendations:
+        if st.session_state.pop("celebrate", False):
+            st.balloons()
+            st.success("✨ AI has found perfect recipes for you!")
         display.display_recommendation(st.session_state.recommendations)
         display.display_overview(st.session_state.recommendations)
         